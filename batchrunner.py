@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Set
+from yaramo.model import Topology
+from controller import compile_scenario, get_sumo_config_file_name, create_routes, create_sumo_scenario
+from metadatacontroller import MetadataController
+from operationqueue import OperationQueue
+from routeconflictmatrix import RouteConflictMatrix, get_route_key
+from routesetexplorer import RouteSetExplorer
+from scenariocache import ScenarioCache
+from schedulecontroller import load_route_ids, load_vehicle_types
+from tracibackend import get_default_backend_name, get_sumo_route_ids, prepare_backend, start_backend
+from simulationcontroller import SimulationController
+from interlocking.interlockinginterface import Interlocking
+from interlocking.model.helper import Settings, InterlockingOperation, InterlockingOperationType
+from interlocking.infrastructureprovider import SUMOInfrastructureProvider
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+class Scenario(object):
+    """A single simulation run, either a schedule file or a set of routes driven by one train each"""
+
+    def __init__(self, name, schedule_file_name=None, route_keys: List[str] | None = None):
+        self.name = name
+        self.schedule_file_name = schedule_file_name
+        self.route_keys: List[str] = route_keys if route_keys is not None else []
+
+
+class BatchSetup(object):
+    """Everything a worker needs to build its own SUMO instance, interlocking and simulation controller"""
+
+    def __init__(self, plan_pro_file_name, plan_pro_version_name, metadata_file_name, generate_routes=False,
+                 max_simulation_time: float | None = None, backend_name="traci"):
+        self.plan_pro_file_name = plan_pro_file_name
+        self.plan_pro_version_name = plan_pro_version_name
+        self.metadata_file_name = metadata_file_name
+        self.generate_routes = generate_routes
+        self.max_simulation_time = max_simulation_time
+        self.backend_name = backend_name
+
+    def compile_scenario(self):
+        scenario_cache = ScenarioCache(self.plan_pro_file_name, self.plan_pro_version_name, self.generate_routes)
+        return compile_scenario(self.plan_pro_file_name, self.plan_pro_version_name, self.generate_routes, scenario_cache)
+
+
+def run_scenario(setup: BatchSetup, scenario: Scenario, label: str) -> Dict:
+    """Runs one scenario against its own headless SUMO, meant to be executed in a worker process"""
+    result = {"name": scenario.name, "completed": False, "error": None}
+    start_wall_time = time.monotonic()
+    try:
+        compiled_scenario = setup.compile_scenario()
+        if compiled_scenario is None:
+            raise RuntimeError("Error importing PlanPro file")
+        topology = compiled_scenario.topology
+        traci_instance = start_backend(setup.backend_name, ["sumo", "-c", get_sumo_config_file_name(topology),
+                                                            "--time-to-teleport", "3000", "--step-length=0.1"], label=label)
+        try:
+            result.update(asyncio.run(_run_scenario(setup, scenario, topology, traci_instance)))
+        finally:
+            traci_instance.close()
+    except Exception as e:
+        logger.exception(f"Scenario {scenario.name} failed")
+        result["error"] = repr(e)
+    result["wall_time"] = time.monotonic() - start_wall_time
+    return result
+
+
+async def _run_scenario(setup: BatchSetup, scenario: Scenario, topology, traci_instance) -> Dict:
+    routes = create_routes(topology, get_sumo_route_ids(traci_instance, topology), traci_instance)
+    metadata_controller = MetadataController()
+    metadata_controller.load_metadata(setup.metadata_file_name, routes)
+
+    sumo_infrastructure_provider = SUMOInfrastructureProvider(traci_instance=traci_instance)
+    operations_queue = OperationQueue()
+    interlocking = Interlocking([sumo_infrastructure_provider], Settings(max_number_of_points_at_same_time=3))
+    interlocking.prepare(topology)
+    vehicle_type_max_speeds = load_vehicle_types(get_sumo_config_file_name(topology))
+    prepare_backend(traci_instance, interlocking, topology, vehicle_type_max_speeds)
+    simulation_controller = SimulationController(metadata_controller.stations, routes, interlocking, operations_queue,
+                                                 sumo_infrastructure_provider, real_time_factor=None,
+                                                 traci_instance=traci_instance)
+    simulation_controller.vehicle_type_max_speeds.update(vehicle_type_max_speeds)
+
+    if scenario.schedule_file_name is not None:
+        simulation_controller.load_schedule(scenario.schedule_file_name)
+    routes_by_key = {get_route_key(route.yaramo_route): route for route in routes}
+    skipped_routes = []
+    for route_key in scenario.route_keys:
+        route = routes_by_key.get(route_key)
+        if route is None:
+            raise ValueError(f"Route {route_key} not found in topology")
+        if not route.available_in_sumo:
+            logger.warning(f"Route {route_key} not available in SUMO, skip it")
+            skipped_routes.append(route_key)
+            continue
+        simulation_controller.add_train_for_routes(f"train_{route_key}", [route])
+    number_of_trains = len(simulation_controller.trains)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(interlocking.run_with_operations_queue(operations_queue))
+        try:
+            await simulation_controller.run_simulation(until=setup.max_simulation_time)
+        finally:
+            operations_queue.put_nowait(InterlockingOperation(InterlockingOperationType.EXIT))
+
+    # A scenario of routes that were all skipped did not run anything
+    all_routes_skipped = len(scenario.route_keys) > 0 and len(skipped_routes) == len(scenario.route_keys)
+    return {"completed": len(simulation_controller.trains) == 0 and not all_routes_skipped,
+            "simulation_time": simulation_controller.vehicle_state.time,
+            "trains": number_of_trains,
+            "finished_trains": [_get_train_result(train) for train in simulation_controller.finished_trains],
+            "unfinished_trains": list(simulation_controller.trains),
+            "skipped_routes": skipped_routes}
+
+
+def _get_train_result(train) -> Dict:
+    operations = [{"departure_delay": operation.actual_departure - operation.departure if operation.departure >= 0 else None,
+                   "arrival_delay": operation.actual_arrival - operation.arrival if operation.arrival >= 0 else None}
+                  for operation in train.operations]
+    return {"name": train.name, "operations": operations}
+
+
+def run_batch(setup: BatchSetup, scenarios: List[Scenario], workers: int | None = None) -> Dict:
+    """Fans the scenarios out over a process pool and gathers the results into one report"""
+    start_wall_time = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {executor.submit(run_scenario, setup, scenario, f"scenario-{i}"): scenario
+                   for i, scenario in enumerate(scenarios)}
+        for future in as_completed(futures):
+            result = future.result()
+            logger.info(f"Scenario {result['name']}: completed {result['completed']}, error {result['error']}, "
+                        f"{result['wall_time']:.1f} s")
+            results.append(result)
+    results.sort(key=lambda result: result["name"])
+    return {"scenarios": results,
+            "completed": sum(1 for result in results if result["completed"]),
+            "failed": sum(1 for result in results if not result["completed"]),
+            "wall_time": time.monotonic() - start_wall_time}
+
+
+def get_available_route_keys(topology: Topology, sumo_route_ids: Set[str]) -> List[str]:
+    """Keys of the routes of the topology that SUMO knows, others can not be driven"""
+    route_keys = sorted(get_route_key(route) for route in topology.routes.values())
+    unavailable_route_keys = [route_key for route_key in route_keys if f"route_{route_key}" not in sumo_route_ids]
+    if len(unavailable_route_keys) > 0:
+        logger.warning(f"Routes not available in SUMO, no scenarios for them: {', '.join(unavailable_route_keys)}")
+    return [route_key for route_key in route_keys if f"route_{route_key}" in sumo_route_ids]
+
+
+def create_route_scenarios(route_keys: List[str]) -> List[Scenario]:
+    return [Scenario(f"route_{route_key}", route_keys=[route_key]) for route_key in route_keys]
+
+
+def create_route_set_scenarios(route_conflict_matrix: RouteConflictMatrix, route_keys: List[str] | None = None,
+                               max_size: int | None = None, sample_count: int | None = None, seed=None) -> List[Scenario]:
+    explorer = RouteSetExplorer(route_conflict_matrix, route_keys)
+    if sample_count is not None:
+        route_sets = explorer.sample_compatible_sets(sample_count, max_size, seed)
+    else:
+        route_sets = list(explorer.get_maximal_compatible_sets(max_size))
+    logger.info(f"Explore {len(route_sets)} sets of compatible routes")
+    return [Scenario(f"routes_{','.join(route_set)}", route_keys=route_set) for route_set in route_sets]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scenarios in parallel, each against its own headless SUMO")
+    parser.add_argument("plan_pro_file", help="Path to the PlanPro file")
+    parser.add_argument("plan_pro_version", help="Version of the PlanPro file")
+    parser.add_argument("metadata_file", help="Path to the metadata file")
+    parser.add_argument("--generate-routes", "-g", action="store_true", help="Generate routes from the PlanPro file")
+    parser.add_argument("--each-route", action="store_true", help="Run one scenario per route")
+    parser.add_argument("--route-set", action="append", default=[], help="Comma separated routes (start-end signal) to run together, can be repeated")
+    parser.add_argument("--compatible-route-sets", action="store_true", help="Run one scenario per maximal set of compatible routes")
+    parser.add_argument("--max-set-size", type=int, default=None, help="Maximum number of routes in a compatible route set")
+    parser.add_argument("--sample", type=int, default=None, help="Only run this many randomly sampled compatible route sets")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for sampling compatible route sets")
+    parser.add_argument("--schedule", action="append", default=[], help="Schedule file to run, can be repeated")
+    parser.add_argument("--backend", choices=["traci", "libsumo"], default=get_default_backend_name(), help="TraCI backend of the workers, each worker process runs its own SUMO")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--max-simulation-time", type=float, default=None, help="Stop each scenario at this simulation time")
+    parser.add_argument("--report", default="batch-report.json", help="File to write the report to")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    setup = BatchSetup(args.plan_pro_file, args.plan_pro_version, args.metadata_file, args.generate_routes, args.max_simulation_time,
+                       args.backend)
+    compiled_scenario = setup.compile_scenario()
+    if compiled_scenario is None:
+        sys.exit(1)
+    topology = compiled_scenario.topology
+    if not Path(get_sumo_config_file_name(topology)).is_file():
+        create_sumo_scenario(topology)
+
+    available_route_keys = get_available_route_keys(topology, load_route_ids(get_sumo_config_file_name(topology)))
+    scenarios: List[Scenario] = []
+    if args.each_route:
+        scenarios.extend(create_route_scenarios(available_route_keys))
+    if args.compatible_route_sets:
+        route_conflict_matrix = RouteConflictMatrix.load_or_compute(topology, setup.plan_pro_file_name, setup.plan_pro_version_name,
+                                                                    setup.generate_routes, processes=args.workers or 1)
+        scenarios.extend(create_route_set_scenarios(route_conflict_matrix, available_route_keys, args.max_set_size, args.sample,
+                                                    args.seed))
+    for route_set in args.route_set:
+        scenarios.append(Scenario(f"routes_{route_set}", route_keys=route_set.split(",")))
+    for schedule_file_name in args.schedule:
+        scenarios.append(Scenario(f"schedule_{Path(schedule_file_name).stem}", schedule_file_name=schedule_file_name))
+    if len(scenarios) == 0:
+        logger.error("No scenarios given, use --each-route, --compatible-route-sets, --route-set or --schedule")
+        sys.exit(1)
+
+    report = run_batch(setup, scenarios, args.workers)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"{report['completed']} of {len(scenarios)} scenarios completed, report written to {args.report}")
+    sys.exit(0 if report["failed"] == 0 else 1)
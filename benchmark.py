@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+from cacheutils import get_package_version
+from typing import Dict
+from controller import create_routes, create_sumo_scenario, get_sumo_config_file_name
+from metadatacontroller import MetadataController
+from operationqueue import OperationQueue
+from routelookahead import LOOKAHEAD_UNITS, RouteLookahead
+from schedulecontroller import load_vehicle_types
+from simulationcontroller import SimulationController
+from syntheticscenario import SyntheticScenario
+from tracibackend import BACKENDS, get_sumo_route_ids, prepare_backend, start_backend
+from interlocking.interlockinginterface import Interlocking
+from interlocking.model.helper import Settings, InterlockingOperation, InterlockingOperationType
+from interlocking.infrastructureprovider import SUMOInfrastructureProvider
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+BENCHMARK_VERSION = 2
+
+
+def get_peak_memory_kb() -> int:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_memory // 1024 if sys.platform == "darwin" else peak_memory
+
+
+def _get_package_versions() -> Dict[str, str]:
+    return {package_name: get_package_version(package_name)
+            for package_name in ("interlocking", "yaramo", "railway-route-generator", "sumo-exporter", "traci")}
+
+
+def run_benchmark(scenario: SyntheticScenario, backend="fake", scenario_dir=".cache/benchmark", step_length=0.1,
+                  max_simulation_time: float | None = None, skip_idle_time=True, route_lookahead: float = 0,
+                  route_lookahead_unit="segments") -> Dict:
+    """Runs the schedule of a synthetic scenario headless and measures the controller"""
+    generation_start = time.perf_counter()
+    topology = scenario.create_topology()
+    metadata_file_name, schedule_file_name = scenario.write_files(scenario_dir)
+    generation_time = time.perf_counter() - generation_start
+
+    startup_start = time.perf_counter()
+    if backend == "fake":
+        vehicle_type_max_speeds = {scenario.train_type: scenario.max_speed}
+    else:
+        create_sumo_scenario(topology)
+        vehicle_type_max_speeds = load_vehicle_types(get_sumo_config_file_name(topology))
+    traci_instance = start_backend(backend, ["sumo", "-c", get_sumo_config_file_name(topology), "--time-to-teleport", "3000",
+                                             f"--step-length={step_length}"], step_length=step_length)
+    try:
+        routes = create_routes(topology, get_sumo_route_ids(traci_instance, topology), traci_instance)
+        metadata_controller = MetadataController()
+        metadata_controller.load_metadata(metadata_file_name, routes)
+
+        sumo_infrastructure_provider = SUMOInfrastructureProvider(traci_instance=traci_instance)
+        operations_queue = OperationQueue()
+        interlocking = Interlocking([sumo_infrastructure_provider], Settings(max_number_of_points_at_same_time=3))
+        interlocking.prepare(topology)
+        prepare_backend(traci_instance, interlocking, topology, vehicle_type_max_speeds)
+        simulation_controller = SimulationController(metadata_controller.stations, routes, interlocking, operations_queue,
+                                                     sumo_infrastructure_provider, real_time_factor=None,
+                                                     traci_instance=traci_instance)
+        simulation_controller.vehicle_type_max_speeds.update(vehicle_type_max_speeds)
+        simulation_controller.skip_idle_time = skip_idle_time
+        simulation_controller.route_lookahead = RouteLookahead(route_lookahead, route_lookahead_unit, traci_instance)
+        simulation_controller.load_schedule(schedule_file_name)
+        startup_time = time.perf_counter() - startup_start
+
+        if max_simulation_time is None:
+            # Generous limit, so that a deadlock ends the run instead of the benchmark
+            max_simulation_time = 2 * scenario.get_planned_duration() + 600
+        run_start = time.perf_counter()
+        asyncio.run(_run_simulation(simulation_controller, interlocking, operations_queue, max_simulation_time))
+        run_time = time.perf_counter() - run_start
+    finally:
+        traci_instance.close()
+
+    simulation_time = simulation_controller.vehicle_state.time
+    steps = round(simulation_time / step_length)
+    return {"benchmark_version": BENCHMARK_VERSION,
+            "scenario": scenario.name,
+            "parameters": scenario.get_parameters(),
+            "backend": backend,
+            "step_length": step_length,
+            "skip_idle_time": skip_idle_time,
+            "route_lookahead": route_lookahead,
+            "route_lookahead_unit": route_lookahead_unit,
+            "python": platform.python_version(),
+            "packages": _get_package_versions(),
+            "completed": len(simulation_controller.trains) == 0,
+            "finished_trains": len(simulation_controller.finished_trains),
+            "simulation_time": simulation_time,
+            "generation_time": generation_time,
+            "startup_time": startup_time,
+            "run_time": run_time,
+            "steps": steps,
+            "steps_per_second": steps / run_time if run_time > 0 else 0.0,
+            "interlocking_operations": operations_queue.number_of_operations,
+            "operations_per_second": operations_queue.number_of_operations / run_time if run_time > 0 else 0.0,
+            "peak_memory_kb": get_peak_memory_kb()}
+
+
+async def _run_simulation(simulation_controller: SimulationController, interlocking: Interlocking,
+                          operations_queue: OperationQueue, max_simulation_time):
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(interlocking.run_with_operations_queue(operations_queue))
+        try:
+            await simulation_controller.run_simulation(until=max_simulation_time)
+        finally:
+            operations_queue.put_nowait(InterlockingOperation(InterlockingOperationType.EXIT))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the controller against a synthetic line of stations")
+    parser.add_argument("--stations", type=int, default=4, help="Number of stations")
+    parser.add_argument("--platforms", type=int, default=2, help="Number of platforms per station")
+    parser.add_argument("--trains", type=int, default=10, help="Number of trains in the schedule")
+    parser.add_argument("--operations", type=int, default=None, help="Operations per train (default: to the last station)")
+    parser.add_argument("--headway", type=int, default=180, help="Seconds between the departures of two trains")
+    parser.add_argument("--backend", choices=BACKENDS, default="fake", help="In-memory fake TraCI or headless SUMO via socket TraCI or libsumo")
+    parser.add_argument("--step-length", type=float, default=0.1, help="Simulated seconds per step")
+    parser.add_argument("--max-simulation-time", type=float, default=None, help="Stop the simulation at this time")
+    parser.add_argument("--no-idle-skip", action="store_true", help="Step through periods in which no train can move")
+    parser.add_argument("--route-lookahead", type=float, default=0, help="Request the next route this far ahead of the end of the current route")
+    parser.add_argument("--route-lookahead-unit", choices=LOOKAHEAD_UNITS, default="segments", help="Unit of --route-lookahead: segments, metres or seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs, the peak memory is the maximum of all runs so far")
+    parser.add_argument("--scenario-dir", default=".cache/benchmark", help="Directory for the generated metadata and schedule")
+    parser.add_argument("--output", "-o", default="-", help="File to write the JSON results to, - for stdout")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Level of the log output")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    synthetic_scenario = SyntheticScenario(args.stations, args.platforms, args.trains, args.operations, args.headway)
+    results = [run_benchmark(synthetic_scenario, args.backend, args.scenario_dir, args.step_length, args.max_simulation_time,
+                             not args.no_idle_skip, args.route_lookahead, args.route_lookahead_unit)
+               for _ in range(args.repeat)]
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(result["completed"] for result in results) else 1)
@@ -0,0 +1,34 @@
+import hashlib
+import sys
+from importlib.metadata import version, PackageNotFoundError
+
+
+def hash_file(file_name, *extra) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(chunk)
+    for value in extra:
+        file_hash.update(str(value).encode())
+    return file_hash.hexdigest()
+
+
+def get_package_version(package_name) -> str:
+    try:
+        return version(package_name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def with_recursion_limit(function):
+    """Calls the function with a raised recursion limit, e.g. to pickle or unpickle a topology.
+
+    Topology, trains, routes and interlocking are graphs of linked objects, pickling them recurses along
+    the links.
+    """
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, 100000))
+    try:
+        return function()
+    finally:
+        sys.setrecursionlimit(recursion_limit)
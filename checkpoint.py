@@ -0,0 +1,138 @@
+import io
+import logging
+import pickle
+from itertools import count
+from pathlib import Path
+from typing import Dict, Hashable
+from cacheutils import with_recursion_limit
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = ".cache/checkpoints"
+
+# Bookkeeping of the SimulationController that belongs to a checkpoint, the rest is configuration
+SIMULATION_ATTRIBUTES = ["trains", "finished_trains", "departure_queue", "trains_in_simulation", "trains_at_route_end",
+                         "route_wait_index", "segment_ids", "segment_index", "vehicle_state"]
+
+
+def get_shared_objects(controller) -> Dict[Hashable, object]:
+    """Objects a checkpoint refers to instead of copying them, by a key that is the same in every controller.
+
+    They are either static (topology, routes, stations) or belong to the controller the checkpoint is
+    restored into (TraCI connection, operations queue, infrastructure providers), so a checkpoint can be
+    restored into the controller it was taken from as well as into another one on the same topology.
+    """
+    simulation_controller = controller.simulation_controller
+    interlocking = controller.interlocking
+    shared_objects: Dict[Hashable, object] = {("controller",): simulation_controller,
+                                              ("interlocking",): interlocking,
+                                              ("traci",): controller.traci_instance,
+                                              ("operations_queue",): controller.operations_queue,
+                                              ("sumo_provider",): simulation_controller.sumo_infrastructure_provider,
+                                              ("profiler",): simulation_controller.profiler,
+                                              ("tracer",): simulation_controller.tracer,
+                                              ("schedule_evaluation",): simulation_controller.schedule_evaluation,
+                                              ("topology",): controller.topology}
+    for i, infrastructure_provider in enumerate(interlocking.infrastructure_providers):
+        shared_objects[("provider", i)] = infrastructure_provider
+    if simulation_controller.route_wait_index.route_conflict_matrix is not None:
+        shared_objects[("route_conflict_matrix",)] = simulation_controller.route_wait_index.route_conflict_matrix
+    for kind, elements in (("node", controller.topology.nodes), ("edge", controller.topology.edges),
+                           ("signal", controller.topology.signals), ("yaramo_route", controller.topology.routes)):
+        for element in elements.values():
+            shared_objects[(kind, element.uuid)] = element
+    for route in controller.routes:
+        shared_objects[("route", route.identifier)] = route
+    for station in controller.stations.values():
+        shared_objects[("station", station.name)] = station
+    return shared_objects
+
+
+class _CheckpointPickler(pickle.Pickler):
+
+    def __init__(self, file, keys_by_id: Dict[int, Hashable]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.keys_by_id = keys_by_id
+
+    def persistent_id(self, obj):
+        return self.keys_by_id.get(id(obj))
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, shared_objects: Dict[Hashable, object]):
+        super().__init__(file)
+        self.shared_objects = shared_objects
+
+    def persistent_load(self, pid):
+        return self.shared_objects[pid]
+
+
+class Checkpoint(object):
+    """State of a simulation at one point in time: SUMO state file, interlocking and train bookkeeping.
+
+    The controller state is kept as pickled bytes, so restoring never shares objects with the state a
+    checkpoint was taken from, and one checkpoint can be restored or forked any number of times.
+    """
+
+    def __init__(self, name, time, sumo_state_file_name, data: bytes):
+        self.name = name
+        self.time = time
+        self.sumo_state_file_name = sumo_state_file_name
+        self.data = data
+
+    def save(self, file_name):
+        with open(file_name, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_name) -> "Checkpoint":
+        with open(file_name, 'rb') as f:
+            return pickle.load(f)
+
+
+async def create_checkpoint(controller, name, checkpoint_dir=DEFAULT_CHECKPOINT_DIR) -> Checkpoint:
+    simulation_controller = controller.simulation_controller
+    if len(simulation_controller.schedule_streams) > 0:
+        raise ValueError("Streamed schedules can not be checkpointed, load the schedule instead")
+    # The interlocking state has to include all submitted operations
+    await controller.operations_queue.flush()
+
+    Path(checkpoint_dir).mkdir(parents=True, exist_ok=True)
+    sumo_state_file_name = str(Path(checkpoint_dir) / f"{name}.sumo-state.xml")
+    controller.traci_instance.simulation.saveState(sumo_state_file_name)
+
+    state = {"interlocking": controller.interlocking.__dict__,
+             "simulation": {attribute: getattr(simulation_controller, attribute) for attribute in SIMULATION_ATTRIBUTES},
+             # The counter only orders departures, continuing with its next value is enough
+             "departure_counter": next(simulation_controller.departure_counter)}
+    keys_by_id = {id(shared_object): key for key, shared_object in get_shared_objects(controller).items()}
+    data = io.BytesIO()
+    with_recursion_limit(lambda: _CheckpointPickler(data, keys_by_id).dump(state))
+    checkpoint = Checkpoint(name, simulation_controller.vehicle_state.time, sumo_state_file_name, data.getvalue())
+    logger.info(f"Created checkpoint {name} at {checkpoint.time} ({len(checkpoint.data)} bytes)")
+    return checkpoint
+
+
+async def restore_checkpoint(controller, checkpoint: Checkpoint):
+    """Restores a checkpoint into the given controller, which can also be a fork on its own SUMO"""
+    simulation_controller = controller.simulation_controller
+    await controller.operations_queue.flush()
+    state = with_recursion_limit(lambda: _CheckpointUnpickler(io.BytesIO(checkpoint.data),
+                                                              get_shared_objects(controller)).load())
+
+    controller.traci_instance.simulation.loadState(checkpoint.sumo_state_file_name)
+    # Replaced in place, the running interlocking task and all references to the interlocking stay valid
+    controller.interlocking.__dict__.update(state["interlocking"])
+    for attribute, value in state["simulation"].items():
+        setattr(simulation_controller, attribute, value)
+    simulation_controller.departure_counter = count(state["departure_counter"])
+    simulation_controller.schedule_streams = []
+
+    # Subscriptions do not survive loading the SUMO state
+    vehicle_state = simulation_controller.vehicle_state
+    vehicle_state.subscribe_simulation()
+    vehicle_state.resubscribe(simulation_controller.trains_in_simulation.keys())
+    vehicle_state.time = controller.traci_instance.simulation.getTime()
+    logger.info(f"Restored checkpoint {checkpoint.name} at {checkpoint.time}")
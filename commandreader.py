@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import sys
+import threading
+from typing import Dict, Optional, Tuple
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+class CommandReader(object):
+    """Collects operator commands from stdin and a local TCP socket without blocking the event loop.
+
+    stdin is read by a daemon thread, which hands every line to the event loop, so neither waiting for
+    the operator nor the end of the program is blocked by it. Socket clients send one command per line
+    and receive one reply line per command.
+    """
+
+    def __init__(self, prompt="#: "):
+        self.prompt = prompt
+        self.commands: asyncio.Queue[Tuple[str, Optional[asyncio.StreamWriter]]] = asyncio.Queue()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.number_of_sources = 0
+        self.clients: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    def start_stdin(self):
+        loop = asyncio.get_running_loop()
+        self.number_of_sources += 1
+
+        def read_stdin():
+            while True:
+                sys.stdout.write(self.prompt)
+                sys.stdout.flush()
+                line = sys.stdin.readline()
+                if line == "":
+                    loop.call_soon_threadsafe(self._close_source)
+                    return
+                loop.call_soon_threadsafe(self.commands.put_nowait, (line.strip(), None))
+
+        threading.Thread(target=read_stdin, name="command-stdin", daemon=True).start()
+
+    async def start_server(self, host, port):
+        self.number_of_sources += 1
+        self.server = await asyncio.start_server(self._handle_client, host, port)
+        logger.info(f"Accepting commands on {host}:{port}")
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients[writer] = asyncio.current_task()  # type: ignore
+        try:
+            while True:
+                line = await reader.readline()
+                if line == b"":
+                    break
+                command = line.decode().strip()
+                if command != "":
+                    await self.commands.put((command, writer))
+        finally:
+            self.clients.pop(writer, None)
+            writer.close()
+
+    def _close_source(self):
+        # Without any source left, nobody can ever send exit
+        self.number_of_sources -= 1
+        if self.number_of_sources == 0:
+            self.commands.put_nowait(("exit", None))
+
+    async def get(self) -> Tuple[str, Optional[asyncio.StreamWriter]]:
+        return await self.commands.get()
+
+    async def reply(self, client: Optional[asyncio.StreamWriter], message: str):
+        if client is None or client.is_closing():
+            return
+        client.write(f"{message}\n".encode())
+        await client.drain()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            # Connected clients are disconnected, their handlers end with the end of their input
+            for writer, client_task in list(self.clients.items()):
+                writer.close()
+                await asyncio.gather(client_task, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
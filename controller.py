@@ -2,25 +2,37 @@
 #   export PYTHONPATH="/usr/local/Cellar/sumo/1.10.0/share/sumo/tools/"
 
 import argparse
-from ast import In
+import json
 import asyncio
 import os
 from pathlib import Path
+import shutil
+import tempfile
 import threading
 import traci
-from random import choice, randint
-from string import ascii_uppercase
 import sys
 from itertools import chain, combinations
 from simulationcontroller import SimulationController
-from schedulecontroller import ScheduleController
+from schedulecontroller import load_vehicle_types
 from metadatacontroller import MetadataController
+from operationqueue import OperationQueue
+from routeconflictmatrix import RouteConflictMatrix, get_route_key
+from routesetexplorer import RouteSetExplorer
+from scenariocache import CompiledScenario, ScenarioCache
+from steptrace import StepTracer
+from observationtrace import ObservationRecorder
+from routelookahead import LOOKAHEAD_UNITS, RouteLookahead
+from scheduleevaluation import ScheduleEvaluation
+from commandreader import CommandReader
+from checkpoint import Checkpoint, DEFAULT_CHECKPOINT_DIR, create_checkpoint, restore_checkpoint
+from tracibackend import BACKENDS, get_default_backend_name, get_sumo_route_ids, prepare_backend, start_backend, connect_backend
+from stepprofiler import StepProfiler
 from interlocking.interlockinginterface import Interlocking
 from interlocking.model.helper import Settings, InterlockingOperation, InterlockingOperationType
-from interlocking.infrastructureprovider import LoggingInfrastructureProvider, SUMOInfrastructureProvider, RandomWaitInfrastructureProvider
+from interlocking.infrastructureprovider import LoggingInfrastructureProvider, SUMOInfrastructureProvider
 from planpro_importer import PlanProVersion, import_planpro
 from yaramo.model import Topology
-from typing import Dict, List
+from typing import Dict, List, Set
 from model import Station, Route
 from sumoexporter import SUMOExporter
 from railwayroutegenerator.routegenerator import RouteGenerator
@@ -29,26 +41,50 @@ from railwayroutegenerator.routegenerator import RouteGenerator
 import logging
 
 # Module-level logger
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class Controller(object):
 
-    def __init__(self, topology: Topology, stations: Dict[str, Station], routes: List[Route] = []):
+    def __init__(self, topology: Topology, stations: Dict[str, Station], routes: List[Route] = [], real_time_factor: float | None = 1.0, wake_order: str = "fifo",
+                 route_conflict_matrix: RouteConflictMatrix | None = None, traci_instance=traci):
         self.topology: Topology = topology
         self.stations: Dict[str, Station] = stations
         self.routes: List[Route] = routes
+        self.route_conflict_matrix = route_conflict_matrix
+        self.traci_instance = traci_instance
         
-        sumo_infrastructure_provider = SUMOInfrastructureProvider(traci_instance=traci)
+        sumo_infrastructure_provider = SUMOInfrastructureProvider(traci_instance=traci_instance)
         infrastructure_provider = [LoggingInfrastructureProvider(),
                                 sumo_infrastructure_provider]
-        self.operations_queue = asyncio.Queue()
+        self.profiler = StepProfiler()
+        self.operations_queue = OperationQueue(self.profiler)
         self.interlocking = Interlocking(infrastructure_provider, Settings(max_number_of_points_at_same_time=3))
         self.interlocking.prepare(self.topology)
         self.interlocking.print_state()
         logger.info(f"infrastructure providers: {self.interlocking.infrastructure_providers}")
         
-        self.simulation_controller = SimulationController(self.stations, self.routes, self.interlocking, self.operations_queue, sumo_infrastructure_provider)
+        self.simulation_controller = SimulationController(self.stations, self.routes, self.interlocking, self.operations_queue, sumo_infrastructure_provider, real_time_factor, wake_order, route_conflict_matrix, traci_instance)
+        self.simulation_controller.profiler = self.profiler
+
+        self.command_reader = CommandReader()
+        self.read_stdin = True
+        self.command_host = "127.0.0.1"
+        self.command_port: int | None = None  # Also accept commands on this local TCP port
+        self.simulation_task: asyncio.Task | None = None
+
+        self.checkpoint_dir = DEFAULT_CHECKPOINT_DIR
+        self.checkpoints: Dict[str, Checkpoint] = {}
+        self.initial_checkpoint: Checkpoint | None = None  # Taken after the first reset, makes further resets fast
+        # Per process, so neither a checkpoint saved as "initial" nor another controller in the same directory overwrites it
+        self.initial_checkpoint_dir: str | None = None
+
+    def record_observations(self, observation_recorder: ObservationRecorder):
+        """Records the observations of every step and the submitted operations, to replay them without SUMO"""
+        self.simulation_controller.observation_recorder = observation_recorder
+        self.operations_queue.observation_recorder = observation_recorder
+
+    def set_route_lookahead(self, lookahead: float, unit="segments"):
+        self.simulation_controller.route_lookahead = RouteLookahead(lookahead, unit, self.traci_instance)
 
     def prepare(self):
         self.print_setup()
@@ -62,13 +98,11 @@ class Controller(object):
             logger.info("%s\t(ID: %s; Available in SUMO: %s)", str(route.yaramo_route), route.yaramo_route.uuid, route.available_in_sumo)
 
     def show_route_conflicts(self):
+        if self.route_conflict_matrix is None:
+            self.route_conflict_matrix = RouteConflictMatrix.compute(self.topology)
         logger.info("Route conflicts:")
-        interlocking = Interlocking([LoggingInfrastructureProvider()])
-        interlocking.prepare(self.topology)
-        for route in self.topology.routes.values():
-            for route2 in self.topology.routes.values():
-                if route.uuid != route2.uuid and interlocking.do_two_routes_collide(route, route2):
-                    logger.warning("%s =/= %s", route, route2)
+        for route_key, route_key2 in self.route_conflict_matrix.get_conflicting_pairs():
+            logger.warning("%s =/= %s", route_key, route_key2)
 
     async def start_controller(self):
         logger.info("Start Interlocking")
@@ -78,75 +112,217 @@ class Controller(object):
             logger.info("Interlocking started, start control loop")
             tg.create_task(self.control())
     
+    async def run_schedules(self, schedule_file_names: List[str], until: float | None = None, checkpoint: Checkpoint | None = None):
+        """Runs the given schedules without the command prompt, e.g. next to other controllers in one event loop.
+
+        Starting from a checkpoint continues its simulation with the given schedules added, e.g. as one of
+        several what-if variants of the same situation.
+        """
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self.interlocking.run_with_operations_queue(self.operations_queue))
+            try:
+                if checkpoint is not None:
+                    await restore_checkpoint(self, checkpoint)
+                else:
+                    await self.reset()
+                for schedule_file_name in schedule_file_names:
+                    self.simulation_controller.load_schedule(schedule_file_name)
+                await self.simulation_controller.run_simulation(until)
+            finally:
+                self.operations_queue.put_nowait(InterlockingOperation(InterlockingOperationType.EXIT))
+                self.simulation_controller.tracer.close()
+                self.simulation_controller.schedule_evaluation.close()
+                self.simulation_controller.observation_recorder.close()
+
     async def enqueue_operation(self, operation):
-        self.operations_queue.put_nowait(operation)
-        await self.operations_queue.join()
+        await self.operations_queue.submit(operation)
 
     async def control(self):
         logger.info("Run Simulation until all vehicles are removed to clean the simulation")
         await self.reset()  # to clean the simulation
         logger.info("Simulation Cleaned, ready to go!")
-        command = None
-        while command != "exit":
-            command = input("#: ")
-            if command == "print setup":
-                self.print_setup()
-            elif command == "print state":
-                await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.PRINT_STATE))
-            elif command == "show route conflicts":
-                self.show_route_conflicts()
-            elif command == "run each route":
-                await self.run_each_route()
-            elif command == "run all combinations of routes":
-                self.run_all_combinations_of_routes()
-            elif command.startswith("train"):
-                self.create_train_from_command(command)
-            elif command.startswith("load schedule"):
-                self.load_schedule(command)
-            elif command.startswith("ls"):
-                self.load_schedule(command)
-            elif command == "print schedule evaluation":
-                self.simulation_controller.print_schedule_evaluation()
-            elif command == "run":
-                await self.simulation_controller.run_simulation()
-            elif command == "reset":
-                await self.reset()
-            elif command != "exit":
-                logger.warning("Command unknown: %s", command)
-        
+        self.initial_checkpoint_dir = tempfile.mkdtemp(prefix="initial-checkpoint-")
+        self.initial_checkpoint = await create_checkpoint(self, "initial", self.initial_checkpoint_dir)
+        if self.read_stdin:
+            self.command_reader.start_stdin()
+        if self.command_port is not None:
+            await self.command_reader.start_server(self.command_host, self.command_port)
+        while True:
+            command, client = await self.command_reader.get()
+            if command == "exit":
+                await self.command_reader.reply(client, "ok")
+                break
+            try:
+                reply = await self.execute_command(command)
+            except Exception as e:
+                logger.exception("Command failed: %s", command)
+                reply = f"error: {e}"
+            await self.command_reader.reply(client, reply)
+
+        if self.is_simulation_running():
+            logger.info("Stop running simulation")
+            self.simulation_task.cancel()  # type: ignore
+            try:
+                await self.simulation_task  # type: ignore
+            except asyncio.CancelledError:
+                pass
+        await self.command_reader.close()
         await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.EXIT))
+        self.simulation_controller.tracer.close()
+        self.simulation_controller.schedule_evaluation.close()
+        self.simulation_controller.observation_recorder.close()
+        if self.initial_checkpoint_dir is not None:
+            shutil.rmtree(self.initial_checkpoint_dir, ignore_errors=True)
 
         logger.info("Close TraCI connection")
-        traci.close()
+        self.traci_instance.close()
+
+    async def execute_command(self, command) -> str:
+        """Executes one command and returns the reply, simulation runs are started in the background"""
+        if command == "print setup":
+            self.print_setup()
+        elif command == "print state":
+            await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.PRINT_STATE))
+        elif command == "print status":
+            return self.get_status()
+        elif command == "show route conflicts":
+            self.show_route_conflicts()
+        elif command == "run each route":
+            return self.start_simulation_task(self.run_each_route())
+        elif command == "run all combinations of routes":
+            return self.start_simulation_task(self.run_all_combinations_of_routes())
+        elif command == "run compatible route sets":
+            return self.start_simulation_task(self.run_compatible_route_sets())
+        elif command.startswith("train"):
+            self.create_train_from_command(command)
+        elif command.startswith("load schedule"):
+            self.load_schedule(command)
+        elif command.startswith("stream schedule"):
+            self.simulation_controller.load_schedule(command.split(" ")[2], lazy=True)
+        elif command.startswith("ls"):
+            self.load_schedule(command)
+        elif command == "print stats":
+            self.profiler.print_stats()
+        elif command.startswith("export stats"):
+            self.profiler.export(command.split(" ")[2])
+        elif command == "print schedule evaluation":
+            self.simulation_controller.print_schedule_evaluation()
+        elif command == "print schedule summary":
+            self.simulation_controller.schedule_evaluation.print_summary()
+            return json.dumps(self.simulation_controller.schedule_evaluation.get_summary())
+        elif command.startswith("export schedule evaluation"):
+            self.simulation_controller.schedule_evaluation.export(command.split(" ")[3])
+        elif command == "run":
+            return self.start_simulation_task(self.simulation_controller.run_simulation())
+        elif command.startswith("run until"):
+            return self.start_simulation_task(self.simulation_controller.run_simulation(until=float(command.split(" ")[2])))
+        elif command.startswith("save checkpoint") or command.startswith("restore checkpoint"):
+            # Only between runs, a running simulation might be in the middle of a step
+            if self.is_simulation_running():
+                return "busy: simulation is running"
+            name = command.split(" ")[2]
+            if command.startswith("save"):
+                checkpoint = await self.save_checkpoint(name)
+            else:
+                checkpoint = self.get_checkpoint(name)
+                await restore_checkpoint(self, checkpoint)
+            return f"ok: checkpoint {name} at {checkpoint.time}"
+        elif command == "reset":
+            if self.is_simulation_running():
+                return "busy: simulation is running"
+            await self.reset()
+        else:
+            logger.warning("Command unknown: %s", command)
+            return f"unknown command: {command}"
+        return "ok"
+
+    def is_simulation_running(self) -> bool:
+        return self.simulation_task is not None and not self.simulation_task.done()
+
+    def start_simulation_task(self, coroutine) -> str:
+        # Commands keep being accepted while the simulation runs, e.g. to add trains or query the status
+        if self.is_simulation_running():
+            coroutine.close()
+            return "busy: simulation is running"
+        self.simulation_task = asyncio.create_task(coroutine)
+        self.simulation_task.add_done_callback(self._log_simulation_result)
+        return "started"
+
+    def _log_simulation_result(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("Simulation failed", exc_info=task.exception())
+        else:
+            logger.info("Simulation finished")
+
+    def get_status(self) -> str:
+        simulation_controller = self.simulation_controller
+        return (f"running: {self.is_simulation_running()}, time: {simulation_controller.vehicle_state.time}, "
+                f"trains: {len(simulation_controller.trains)}, in simulation: {len(simulation_controller.trains_in_simulation)}, "
+                f"blocked: {len(simulation_controller.route_wait_index)}, finished: {len(simulation_controller.finished_trains)}")
 
     async def reset(self):
+        """Starts over with an empty simulation.
+
+        The schedule evaluation starts over as well, the trains it refers to are gone after restoring the
+        initial checkpoint. Records already written to the evaluation file are kept.
+        """
+        self.simulation_controller.schedule_evaluation.reset()
+        if self.initial_checkpoint is not None:
+            # Loads one SUMO state instead of removing the vehicles one by one
+            await restore_checkpoint(self, self.initial_checkpoint)
+            return
         await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.RESET))
-        for vehicle_id in traci.vehicle.getIDList():
-            traci.vehicle.remove(vehicle_id)
+        for vehicle_id in self.traci_instance.vehicle.getIDList():
+            self.traci_instance.vehicle.remove(vehicle_id)
+
+    async def save_checkpoint(self, name) -> Checkpoint:
+        checkpoint = await create_checkpoint(self, name, self.checkpoint_dir)
+        checkpoint.save(Path(self.checkpoint_dir) / f"{name}.checkpoint")
+        self.checkpoints[name] = checkpoint
+        return checkpoint
+
+    def get_checkpoint(self, name) -> Checkpoint:
+        checkpoint = self.checkpoints.get(name)
+        if checkpoint is None:
+            checkpoint = self.checkpoints[name] = Checkpoint.load(Path(self.checkpoint_dir) / f"{name}.checkpoint")
+        return checkpoint
 
     async def run_each_route(self):
-        # TODO: Not working atm
         logger.info("Run each route")
         for route in self.routes:
             if route.available_in_sumo:
-                self.simulation_controller.create_train("train", route)
+                self.simulation_controller.add_train_for_routes(f"train_{route.identifier}", [route])
                 await self.simulation_controller.run_simulation()
                 await self.reset()
 
-    def run_all_combinations_of_routes(self):
-        # TODO: Not working atm
+    async def run_all_combinations_of_routes(self):
         logger.info("Run all combinations of routes")
 
         # see https://stackoverflow.com/a/5898031
         def all_subsets(ss):
             return chain(*map(lambda x: combinations(ss, x), range(1, len(ss) + 1)))
 
-        for subset in all_subsets(self.routes):
+        for subset in all_subsets([route for route in self.routes if route.available_in_sumo]):
             logger.info("Run combination of %d routes", len(subset))
             for route in subset:
-                self.simulation_controller.create_train(f"train_{route.to_string()}", route)
-            self.simulation_controller.run_simulation()
-            self.reset()
+                self.simulation_controller.add_train_for_routes(f"train_{route.identifier}", [route])
+            await self.simulation_controller.run_simulation()
+            await self.reset()
+
+    async def run_compatible_route_sets(self):
+        logger.info("Run all maximal sets of compatible routes")
+        if self.route_conflict_matrix is None:
+            self.route_conflict_matrix = RouteConflictMatrix.compute(self.topology)
+        routes_by_key = {get_route_key(route.yaramo_route): route for route in self.routes if route.available_in_sumo}
+        explorer = RouteSetExplorer(self.route_conflict_matrix, list(routes_by_key.keys()))
+        for route_set in explorer.get_maximal_compatible_sets():
+            logger.info("Run set of %d compatible routes", len(route_set))
+            for route_key in route_set:
+                self.simulation_controller.add_train_for_routes(f"train_{route_key}", [routes_by_key[route_key]])
+            await self.simulation_controller.run_simulation()
+            await self.reset()
 
     def create_train_from_command(self, command):
         cmd_splits = command.split(" ")
@@ -164,6 +340,76 @@ class Controller(object):
             self.simulation_controller.load_schedule(command.split(" ")[2])
 
 
+def import_topology(plan_pro_file_name, plan_pro_version_name, generate_routes=False) -> Topology | None:
+    plan_pro_version = None
+    if plan_pro_version_name == "1.10":
+        plan_pro_version = PlanProVersion.PlanPro110
+    elif plan_pro_version_name == "1.9":
+        plan_pro_version = PlanProVersion.PlanPro19
+    else:
+        logger.error("PlanPro version %s not supported, use 1.9 or 1.10", plan_pro_version_name)
+        return None
+
+    topology: Topology | None = import_planpro(plan_pro_file_name, plan_pro_version)
+    if topology is None:
+        logger.error("Error importing PlanPro file")
+        return None
+    logger.info("Imported topology from PlanPro file")
+
+    if generate_routes:
+        RouteGenerator(topology).generate_routes()
+    for route in topology.routes.values():
+        route.update_maximum_speed()
+    return topology
+
+
+def compile_scenario(plan_pro_file_name, plan_pro_version_name, generate_routes=False,
+                     scenario_cache: ScenarioCache | None = None) -> CompiledScenario | None:
+    if scenario_cache is not None:
+        compiled_scenario = scenario_cache.load()
+        if compiled_scenario is not None:
+            return compiled_scenario
+    topology = import_topology(plan_pro_file_name, plan_pro_version_name, generate_routes)
+    if topology is None:
+        return None
+    compiled_scenario = CompiledScenario(topology)
+    if scenario_cache is not None:
+        scenario_cache.save(compiled_scenario)
+    return compiled_scenario
+
+
+def get_sumo_config_file_name(topology: Topology) -> str:
+    return f"sumo-config/{topology.name}.scenario.sumocfg"
+
+
+def create_routes(topology: Topology, sumo_routes: Set[str] | None = None, traci_instance=traci) -> List[Route]:
+    routes: list[Route] = []
+    if sumo_routes is None:
+        sumo_routes = set(traci_instance.route.getIDList())
+    for yaramo_route in topology.routes.values():
+        available_in_sumo = f"route_{yaramo_route.start_signal.name}-{yaramo_route.end_signal.name}" in sumo_routes # type: ignore
+        route = Route(yaramo_route, available_in_sumo)
+        routes.append(route)
+    return routes
+
+
+def create_controller(topology: Topology, metadata_file_name, traci_instance, sumo_route_ids: Set[str] | None = None,
+                      real_time_factor: float | None = 1.0, wake_order="fifo",
+                      route_conflict_matrix: RouteConflictMatrix | None = None) -> Controller:
+    """Creates a controller with its own interlocking and operations queue on the given TraCI handle"""
+    routes = create_routes(topology, get_sumo_route_ids(traci_instance, topology, sumo_route_ids), traci_instance)
+
+    metadata_controller = MetadataController()
+    metadata_controller.load_metadata(metadata_file_name, routes)
+
+    controller = Controller(topology, metadata_controller.stations, routes, real_time_factor, wake_order, route_conflict_matrix,
+                            traci_instance)
+    vehicle_type_max_speeds = load_vehicle_types(get_sumo_config_file_name(topology))
+    controller.simulation_controller.vehicle_type_max_speeds.update(vehicle_type_max_speeds)
+    prepare_backend(traci_instance, controller.interlocking, topology, vehicle_type_max_speeds)
+    return controller
+
+
 def create_sumo_scenario(topology: Topology):
     sumo_exporter = SUMOExporter(topology)
     sumo_exporter.convert()
@@ -174,6 +420,14 @@ def create_sumo_scenario(topology: Topology):
     logging.info("or")
     logging.info(f"sumo -c sumo-config/{topology.name}.scenario.sumocfg --remote-port 4444 --step-length=0.1")
 
+
+def positive_float(value) -> float:
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {value}")
+    return number
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process PlanPro files")
     parser.add_argument("plan_pro_file", help="Path to the PlanPro file")
@@ -182,50 +436,78 @@ if __name__ == "__main__":
     parser.add_argument("--generate-routes", "-g", action="store_true", help="Generate routes from the PlanPro file")
     parser.add_argument("--traci-port", "-p", type=int, default=4444, help="Port for the TraCI connection")
     parser.add_argument("--traci-host", "-H", type=str, default="localhost", help="Host for the TraCI connection")
+    parser.add_argument("--headless", "--fast", action="store_true", help="Start sumo without GUI and run the simulation as fast as possible")
+    parser.add_argument("--backend", choices=BACKENDS, default=get_default_backend_name(), help="TraCI backend, libsumo and fake always run headless (default: traci, libsumo if LIBSUMO_AS_TRACI is set)")
+    parser.add_argument("--real-time-factor", "-r", type=positive_float, default=None, help="Simulated seconds per wall-clock second (default: 1 with GUI, unlimited when headless)")
+    parser.add_argument("--no-idle-skip", action="store_true", help="Step through periods in which no train can move instead of jumping to the next departure")
+    parser.add_argument("--route-lookahead", type=float, default=0, help="Request the next route this far ahead of the end of the current route (default: at the end)")
+    parser.add_argument("--route-lookahead-unit", choices=LOOKAHEAD_UNITS, default="segments", help="Unit of --route-lookahead: segments, metres or seconds")
+    parser.add_argument("--wake-order", choices=["fifo", "priority"], default="fifo", help="Order in which trains waiting for a blocked route are retried")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the compiled scenario and route conflict caches")
+    parser.add_argument("--conflict-processes", type=int, default=1, help="Number of processes to compute the route conflicts with")
+    parser.add_argument("--profile", action="store_true", help="Measure the latency of the simulation steps and interlocking operations")
+    parser.add_argument("--profile-output", default=None, help="Export the profiling statistics to this JSON file on exit")
+    parser.add_argument("--evaluation-output", default=None, help="Write the evaluation of every completed operation to this CSV (.csv) or JSON-Lines file")
+    parser.add_argument("--command-port", type=int, default=None, help="Also accept commands, one per line, on this local TCP port")
+    parser.add_argument("--command-host", default="127.0.0.1", help="Address to accept commands on")
+    parser.add_argument("--no-stdin", action="store_true", help="Do not read commands from stdin, e.g. when driven via --command-port")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Level of the log output")
+    parser.add_argument("--trace", default=None, help="Write a JSON-Lines trace of the simulation steps to this file")
+    parser.add_argument("--record", default=None, help="Record the observations of every step and the interlocking operations to this JSON-Lines file, see replaytrace.py")
+    parser.add_argument("--trace-level", default="INFO", choices=["DEBUG", "INFO"], help="Level of the step trace, DEBUG includes every segment change")
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
 
     plan_pro_file_name = args.plan_pro_file
     plan_pro_version_name = args.plan_pro_version
     metadata_file_name = args.metadata_file
 
-    plan_pro_version = None
-    if plan_pro_version_name == "1.10":
-        plan_pro_version = PlanProVersion.PlanPro110
-    elif plan_pro_version_name == "1.9":
-        plan_pro_version = PlanProVersion.PlanPro19
-    else:
-        logger.error("PlanPro version %s not supported, use 1.9 or 1.10", plan_pro_version_name)
-        sys.exit(1)
-
-    topology: Topology | None = import_planpro(plan_pro_file_name, plan_pro_version)
-    if topology is None:
-        logger.error("Error importing PlanPro file")
+    scenario_cache = None if args.no_cache else ScenarioCache(plan_pro_file_name, plan_pro_version_name, args.generate_routes)
+    compiled_scenario = compile_scenario(plan_pro_file_name, plan_pro_version_name, args.generate_routes, scenario_cache)
+    if compiled_scenario is None:
         sys.exit(1)
-    logger.info("Imported topology from PlanPro file")
+    topology = compiled_scenario.topology
 
-    if args.generate_routes:
-        RouteGenerator(topology).generate_routes()    
-    for route in topology.routes.values():
-        route.update_maximum_speed()
+    if args.no_cache:
+        route_conflict_matrix = RouteConflictMatrix.compute(topology, args.conflict_processes)
+    else:
+        route_conflict_matrix = RouteConflictMatrix.load_or_compute(topology, plan_pro_file_name, plan_pro_version_name, args.generate_routes,
+                                                                    processes=args.conflict_processes)
 
-    if not Path(f"./sumo-config/{topology.name}.scenario.sumocfg").is_file():
+    if not Path(get_sumo_config_file_name(topology)).is_file():
         create_sumo_scenario(topology)
 
-    threading.Thread(target=lambda: os.system(f"sumo-gui -c sumo-config/{topology.name}.scenario.sumocfg --remote-port 4444 --time-to-teleport 3000 --step-length=0.1 -S")).start() # type: ignore
-
-    logger.info("Init TraCI connection")
-    traci.init(host=args.traci_host, port=args.traci_port)
-
-    routes: list[Route] = []
-    sumo_routes = traci.route.getIDList()
-    for yaramo_route in topology.routes.values():
-        available_in_sumo = f"route_{yaramo_route.start_signal.name}-{yaramo_route.end_signal.name}" in sumo_routes # type: ignore
-        route = Route(yaramo_route, available_in_sumo)
-        routes.append(route)
-
-    metadata_controller = MetadataController()
-    metadata_controller.load_metadata(metadata_file_name, routes)
-
-    controller = Controller(topology, metadata_controller.stations, routes)
+    real_time_factor = args.real_time_factor
+    if args.headless or args.backend != "traci":
+        logger.info(f"Start sumo headless with the {args.backend} backend")
+        traci_instance = start_backend(args.backend, ["sumo", "-c", get_sumo_config_file_name(topology), "--time-to-teleport", "3000", "--step-length=0.1"],
+                                       port=args.traci_port)
+    else:
+        threading.Thread(target=lambda: os.system(f"sumo-gui -c {get_sumo_config_file_name(topology)} --remote-port {args.traci_port} --time-to-teleport 3000 --step-length=0.1 -S")).start() # type: ignore
+
+        logger.info("Init TraCI connection")
+        traci_instance = connect_backend(args.backend, args.traci_host, args.traci_port)
+        if real_time_factor is None:
+            real_time_factor = 1.0
+
+    controller = create_controller(topology, metadata_file_name, traci_instance, real_time_factor=real_time_factor,
+                                   wake_order=args.wake_order, route_conflict_matrix=route_conflict_matrix)
+    controller.profiler.enabled = args.profile or args.profile_output is not None
+    controller.simulation_controller.skip_idle_time = not args.no_idle_skip
+    controller.set_route_lookahead(args.route_lookahead, args.route_lookahead_unit)
+    if args.evaluation_output is not None:
+        controller.simulation_controller.schedule_evaluation = ScheduleEvaluation(args.evaluation_output)
+    if args.trace is not None:
+        controller.simulation_controller.tracer = StepTracer(args.trace, getattr(logging, args.trace_level))
+    if args.record is not None:
+        controller.record_observations(ObservationRecorder(args.record))
+    controller.read_stdin = not args.no_stdin
+    controller.command_host = args.command_host
+    controller.command_port = args.command_port
+    if args.no_stdin and args.command_port is None:
+        logger.error("Without stdin, --command-port is needed to control the simulation")
+        sys.exit(1)
     controller.prepare()
     asyncio.run(controller.start_controller())
+    if args.profile_output is not None:
+        controller.profiler.export(args.profile_output)
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+from controller import Controller, compile_scenario, create_controller, create_sumo_scenario, get_sumo_config_file_name
+from checkpoint import Checkpoint
+from scenariocache import ScenarioCache
+from tracibackend import start_backend
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+class ControllerInstance(object):
+    """One supervised controller with its own topology, schedules and SUMO connection"""
+
+    def __init__(self, name, plan_pro_file_name, plan_pro_version_name, metadata_file_name, schedule_file_names: List[str],
+                 generate_routes=False, checkpoint_file_name: str | None = None):
+        self.name = name
+        self.plan_pro_file_name = plan_pro_file_name
+        self.plan_pro_version_name = plan_pro_version_name
+        self.metadata_file_name = metadata_file_name
+        self.schedule_file_names = schedule_file_names
+        self.generate_routes = generate_routes
+        # Continue from this checkpoint instead of starting from the beginning
+        self.checkpoint_file_name = checkpoint_file_name
+
+    @classmethod
+    def from_json(cls, instance_json) -> "ControllerInstance":
+        return cls(instance_json["name"], instance_json["plan_pro_file"], instance_json["plan_pro_version"],
+                   instance_json["metadata_file"], instance_json.get("schedules", []), instance_json.get("generate_routes", False),
+                   instance_json.get("checkpoint"))
+
+
+class ControllerSupervisor(object):
+    """Runs several controllers concurrently in one event loop, each on its own TraCI connection.
+
+    Every instance gets its own interlocking and operations queue. With socket TraCI each instance steps
+    its SUMO in a worker thread, so the SUMO processes compute their steps in parallel while the
+    controllers share the event loop.
+    """
+
+    def __init__(self, instances: List[ControllerInstance], backend_name="traci", max_simulation_time: float | None = None):
+        if backend_name == "libsumo" and len(instances) > 1:
+            raise ValueError("libsumo runs one simulation per process, use the traci backend to supervise several")
+        self.instances = instances
+        self.backend_name = backend_name
+        self.max_simulation_time = max_simulation_time
+
+    def start_instance(self, instance: ControllerInstance) -> Controller:
+        scenario_cache = ScenarioCache(instance.plan_pro_file_name, instance.plan_pro_version_name, instance.generate_routes)
+        compiled_scenario = compile_scenario(instance.plan_pro_file_name, instance.plan_pro_version_name,
+                                             instance.generate_routes, scenario_cache)
+        if compiled_scenario is None:
+            raise RuntimeError(f"Error importing PlanPro file {instance.plan_pro_file_name}")
+        topology = compiled_scenario.topology
+        if not Path(get_sumo_config_file_name(topology)).is_file():
+            create_sumo_scenario(topology)
+
+        traci_instance = start_backend(self.backend_name, ["sumo", "-c", get_sumo_config_file_name(topology),
+                                                           "--time-to-teleport", "3000", "--step-length=0.1"],
+                                       label=instance.name)
+        try:
+            controller = create_controller(topology, instance.metadata_file_name, traci_instance, real_time_factor=None)
+        except Exception:
+            traci_instance.close()
+            raise
+        # The fake steps in no time, a worker thread would only add overhead
+        controller.simulation_controller.step_in_thread = self.backend_name != "fake"
+        return controller
+
+    async def run_instance(self, instance: ControllerInstance, controller: Controller) -> Dict:
+        result = {"name": instance.name, "completed": False, "error": None}
+        start_wall_time = time.monotonic()
+        try:
+            checkpoint = Checkpoint.load(instance.checkpoint_file_name) if instance.checkpoint_file_name is not None else None
+            await controller.run_schedules(instance.schedule_file_names, self.max_simulation_time, checkpoint)
+            simulation_controller = controller.simulation_controller
+            result.update({"completed": len(simulation_controller.trains) == 0,
+                           "simulation_time": simulation_controller.vehicle_state.time,
+                           "finished_trains": [train.name for train in simulation_controller.finished_trains],
+                           "unfinished_trains": list(simulation_controller.trains)})
+        except Exception as e:
+            logger.exception(f"Instance {instance.name} failed")
+            result["error"] = repr(e)
+        finally:
+            controller.traci_instance.close()
+        result["wall_time"] = time.monotonic() - start_wall_time
+        logger.info(f"Instance {instance.name}: completed {result['completed']}, error {result['error']}, "
+                    f"{result['wall_time']:.1f} s")
+        return result
+
+    async def run(self) -> Dict:
+        start_wall_time = time.monotonic()
+        # Starting is blocking (import, SUMO start), the instances are run concurrently afterwards
+        results: List[Dict] = [{} for _ in self.instances]
+        started = []
+        for i, instance in enumerate(self.instances):
+            try:
+                started.append((i, instance, self.start_instance(instance)))
+            except Exception as e:
+                # Reported like a failed run, the other instances still run
+                logger.exception(f"Instance {instance.name} could not be started")
+                results[i] = {"name": instance.name, "completed": False, "error": repr(e), "wall_time": 0.0}
+        run_results = await asyncio.gather(*(self.run_instance(instance, controller) for _, instance, controller in started))
+        for (i, _, _), result in zip(started, run_results):
+            results[i] = result
+        return {"instances": list(results),
+                "completed": sum(1 for result in results if result["completed"]),
+                "failed": sum(1 for result in results if not result["completed"]),
+                "wall_time": time.monotonic() - start_wall_time}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several controllers concurrently in one process")
+    parser.add_argument("instances_file", help="JSON file with the list of instances (name, plan_pro_file, plan_pro_version, metadata_file, schedules, generate_routes, checkpoint)")
+    parser.add_argument("--backend", choices=["traci", "fake"], default="traci", help="TraCI backend of the instances")
+    parser.add_argument("--max-simulation-time", type=float, default=None, help="Stop each instance at this simulation time")
+    parser.add_argument("--report", default="supervisor-report.json", help="File to write the report to")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Level of the log output")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    with open(args.instances_file, 'r') as f:
+        instances = [ControllerInstance.from_json(instance_json) for instance_json in json.load(f)]
+    if len(set(instance.name for instance in instances)) != len(instances):
+        logger.error("The names of the instances have to be unique, they are the labels of the TraCI connections")
+        sys.exit(1)
+
+    supervisor = ControllerSupervisor(instances, args.backend, args.max_simulation_time)
+    report = asyncio.run(supervisor.run())
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"{report['completed']} of {len(instances)} instances completed, report written to {args.report}")
+    sys.exit(0 if report["failed"] == 0 else 1)
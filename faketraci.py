@@ -0,0 +1,330 @@
+import logging
+import pickle
+from typing import Dict, List, Set
+from traci import constants as tc
+from traci.exceptions import TraCIException
+from routeconflictmatrix import get_route_key
+from interlocking.interlockinginterface import Interlocking
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+class FakeRoute(object):
+
+    def __init__(self, route_id, edges: List[str], start_signal: str | None = None):
+        self.route_id = route_id
+        self.edges = edges
+        # Signal at the end of the first edge, trains wait in front of it while it shows stop
+        self.start_signal = start_signal
+
+
+class FakeVehicle(object):
+
+    def __init__(self, vehicle_id, route: FakeRoute, type_id):
+        self.vehicle_id = vehicle_id
+        self.route = route
+        self.type_id = type_id
+        self.edge_index = 0
+        self.position = 0.0
+        self.speed = 0.0
+
+
+class _Domain(object):
+    # TraCI calls the fake does not model, e.g. the GUI or point internals, are accepted and ignored
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+
+class _SimulationDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+        self._subscribed: List[int] = []
+
+    def subscribe(self, var_ids):
+        self._subscribed = list(var_ids)
+
+    def getSubscriptionResults(self):
+        values = {tc.VAR_TIME: self._fake.time,
+                  tc.VAR_DEPARTED_VEHICLES_IDS: tuple(self._fake.departed),
+                  tc.VAR_ARRIVED_VEHICLES_IDS: tuple(self._fake.arrived)}
+        return {var_id: values[var_id] for var_id in self._subscribed}
+
+    def getTime(self):
+        return self._fake.time
+
+    def getDeltaT(self):
+        return self._fake.step_length
+
+    def saveState(self, fileName):
+        self._fake.save_state(fileName)
+
+    def loadState(self, fileName):
+        self._fake.load_state(fileName)
+
+
+class _VehicleDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+        self._subscribed: Dict[str, List[int]] = {}
+
+    def add(self, vehID, routeID, typeID="DEFAULT_VEHTYPE", *args, **kwargs):
+        if vehID in self._fake.vehicles:
+            raise TraCIException(f"Vehicle '{vehID}' to add already exists.")
+        self._fake.pending_vehicles.append(FakeVehicle(vehID, self._fake.get_route(routeID), typeID))
+
+    def remove(self, vehID, reason=tc.REMOVE_VAPORIZED):
+        vehicle = self._fake.vehicles.pop(vehID, None)
+        if vehicle is not None:
+            self._fake.arrived.append(vehID)
+        self._subscribed.pop(vehID, None)
+
+    def setRouteID(self, vehID, routeID):
+        vehicle = self._fake.vehicles.get(vehID)
+        if vehicle is None:
+            # Added in this step, but not inserted yet
+            pending_vehicle = next((vehicle for vehicle in self._fake.pending_vehicles if vehicle.vehicle_id == vehID), None)
+            if pending_vehicle is None:
+                raise TraCIException(f"Vehicle '{vehID}' is not known.")
+            pending_vehicle.route = self._fake.get_route(routeID)
+            return
+        route = self._fake.get_route(routeID)
+        current_edge = vehicle.route.edges[vehicle.edge_index]
+        if len(route.edges) == 0 or route.edges[0] != current_edge:
+            raise TraCIException(f"Route replacement failed for {vehID}, {routeID} does not start on {current_edge}")
+        vehicle.route = route
+        vehicle.edge_index = 0
+
+    def subscribe(self, objectID, varIDs):
+        self._subscribed[objectID] = list(varIDs)
+
+    def getAllSubscriptionResults(self):
+        results = {}
+        for vehicle_id, var_ids in self._subscribed.items():
+            vehicle = self._fake.vehicles.get(vehicle_id)
+            if vehicle is None:
+                continue
+            values = {tc.VAR_ROAD_ID: vehicle.route.edges[vehicle.edge_index],
+                      tc.VAR_SPEED: vehicle.speed,
+                      tc.VAR_STOPSTATE: 0}
+            results[vehicle_id] = {var_id: values[var_id] for var_id in var_ids}
+        return results
+
+    def getIDList(self):
+        return tuple(self._fake.vehicles)
+
+    def getRoadID(self, vehID):
+        vehicle = self._fake.vehicles[vehID]
+        return vehicle.route.edges[vehicle.edge_index]
+
+    def getSpeed(self, vehID):
+        return self._fake.vehicles[vehID].speed
+
+
+class _RouteDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+
+    def getIDList(self):
+        return tuple(self._fake.routes)
+
+    def getEdges(self, routeID):
+        return list(self._fake.get_route(routeID).edges)
+
+
+class _VehicleTypeDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+
+    def getMaxSpeed(self, typeID):
+        return self._fake.vehicle_type_max_speeds.get(typeID, self._fake.default_max_speed)
+
+
+class _EdgeDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+
+    def getIDList(self):
+        return tuple({edge: None for route in self._fake.routes.values() for edge in route.edges})
+
+
+class _LaneDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+
+    def getLength(self, laneID):
+        # Every edge has a single lane
+        return self._fake.edge_lengths.get(laneID.rsplit("_", 1)[0], self._fake.default_edge_length)
+
+
+class _TrafficLightDomain(_Domain):
+
+    def __init__(self, fake: "FakeTraci"):
+        self._fake = fake
+
+    def setRedYellowGreenState(self, tlsID, state):
+        self._fake.signal_states[tlsID] = state
+
+    def getRedYellowGreenState(self, tlsID):
+        return self._fake.signal_states.get(tlsID, "r")
+
+
+class FakeTraci(object):
+    """In-memory stand-in for the traci module, to measure the controller without running SUMO.
+
+    Implements the part of TraCI the controller and the SUMO infrastructure provider use. Vehicles
+    drive along the edges of their route at the maximum speed of their type, stop in front of the
+    start signal of their route as long as it shows stop and arrive at the end of their route.
+    Signals are switched by the infrastructure provider via ``trafficlight.setRedYellowGreenState``.
+    """
+
+    def __init__(self, routes: Dict[str, FakeRoute], edge_lengths: Dict[str, float] | None = None,
+                 default_edge_length=200.0, vehicle_type_max_speeds: Dict[str, float] | None = None,
+                 default_max_speed=30.0, step_length=0.1):
+        self.routes = routes
+        self.edge_lengths: Dict[str, float] = edge_lengths if edge_lengths is not None else {}
+        self.default_edge_length = default_edge_length
+        # Maximum speed per vehicle type in m/s, like SUMO reports it
+        self.vehicle_type_max_speeds: Dict[str, float] = vehicle_type_max_speeds if vehicle_type_max_speeds is not None else {}
+        self.default_max_speed = default_max_speed
+        self.step_length = step_length
+        self.time = 0.0
+        self.step_counter = 0
+        self.vehicles: Dict[str, FakeVehicle] = {}
+        self.pending_vehicles: List[FakeVehicle] = []
+        self.departed: List[str] = []
+        self.arrived: List[str] = []
+        self.signal_states: Dict[str, str] = {}
+
+        self.simulation = _SimulationDomain(self)
+        self.vehicle = _VehicleDomain(self)
+        self.route = _RouteDomain(self)
+        self.vehicletype = _VehicleTypeDomain(self)
+        self.trafficlight = _TrafficLightDomain(self)
+        self.gui = _Domain()
+        self.edge = _EdgeDomain(self)
+        self.lane = _LaneDomain(self)
+
+    @staticmethod
+    def get_route_ids(topology) -> Set[str]:
+        # Known before the interlocking is prepared, the routes themselves are built by prepare
+        return {f"route_{get_route_key(yaramo_route)}" for yaramo_route in topology.routes.values()}
+
+    def prepare(self, interlocking: Interlocking, topology, vehicle_type_max_speeds: Dict[str, float]):
+        """Builds the routes from the prepared interlocking, the maximum speeds are given in km/h"""
+        self.routes.update(create_fake_routes(interlocking, topology))
+        self.vehicle_type_max_speeds.update({type_id: max_speed / 3.6 for type_id, max_speed in vehicle_type_max_speeds.items()})
+
+    def get_route(self, route_id) -> FakeRoute:
+        route = self.routes.get(route_id)
+        if route is None:
+            raise TraCIException(f"The route '{route_id}' is not known.")
+        return route
+
+    def is_signal_go(self, signal_name) -> bool:
+        state = self.signal_states.get(signal_name, "r")
+        return "G" in state or "g" in state
+
+    def simulationStep(self, step=0.0):
+        target_time = step if step > 0 else self.time + self.step_length
+        self.departed = []
+        self.arrived = []
+        # Like SUMO, an empty step still moves time forward by at least one step length
+        while True:
+            self._step()
+            if self.time + self.step_length / 2 >= target_time:
+                break
+
+    def _step(self):
+        self.step_counter += 1
+        self.time = round(self.step_counter * self.step_length, 6)
+        for vehicle in self.pending_vehicles:
+            self.vehicles[vehicle.vehicle_id] = vehicle
+            self.departed.append(vehicle.vehicle_id)
+        self.pending_vehicles.clear()
+
+        arrived_vehicles = []
+        for vehicle in self.vehicles.values():
+            if self._move(vehicle):
+                arrived_vehicles.append(vehicle.vehicle_id)
+        for vehicle_id in arrived_vehicles:
+            del self.vehicles[vehicle_id]
+            self.vehicle._subscribed.pop(vehicle_id, None)
+            self.arrived.append(vehicle_id)
+
+    def _move(self, vehicle: FakeVehicle) -> bool:
+        """Moves the vehicle by one step, returns True if it reached the end of its route"""
+        max_speed = self.vehicle_type_max_speeds.get(vehicle.type_id, self.default_max_speed)
+        distance = max_speed * self.step_length
+        moved = 0.0
+        route = vehicle.route
+        while True:
+            edge_length = self.edge_lengths.get(route.edges[vehicle.edge_index], self.default_edge_length)
+            remaining = edge_length - vehicle.position
+            if distance - moved < remaining:
+                vehicle.position += distance - moved
+                vehicle.speed = max_speed
+                return False
+            moved += remaining
+            vehicle.position = edge_length
+            if vehicle.edge_index == len(route.edges) - 1:
+                return True
+            if vehicle.edge_index == 0 and route.start_signal is not None and not self.is_signal_go(route.start_signal):
+                vehicle.speed = 0.0
+                return False
+            vehicle.edge_index += 1
+            vehicle.position = 0.0
+
+    def save_state(self, file_name):
+        with open(file_name, 'wb') as f:
+            pickle.dump((self.step_counter, self.time, self.vehicles, self.pending_vehicles, self.signal_states), f)
+
+    def load_state(self, file_name):
+        with open(file_name, 'rb') as f:
+            self.step_counter, self.time, self.vehicles, self.pending_vehicles, self.signal_states = pickle.load(f)
+        # Like in SUMO, subscriptions end with loading a state
+        self.vehicle._subscribed.clear()
+        self.departed = []
+        self.arrived = []
+
+    def close(self):
+        self.vehicles.clear()
+        self.pending_vehicles.clear()
+
+
+def create_fake_routes(interlocking: Interlocking, topology) -> Dict[str, FakeRoute]:
+    """Builds the SUMO routes from the segments of the interlocking routes.
+
+    Like the routes of the SUMO exporter, a route starts on the segment in front of its start signal, that
+    is the last segment of the routes ending there, and the train waits at the end of it for the signal.
+    """
+    segments_by_route_key: Dict[str, List[str]] = {}
+    approach_segments: Dict[str, str] = {}
+    for yaramo_route in topology.routes.values():
+        interlocking_route = interlocking.get_route_from_yaramo_route(yaramo_route)
+        segments_by_route_key[get_route_key(yaramo_route)] = [segment.segment_id for segment in interlocking_route.get_segments_of_route()]
+        approach_segments[yaramo_route.end_signal.name] = interlocking_route.get_last_segment_of_route().segment_id
+
+    fake_routes = {}
+    for yaramo_route in topology.routes.values():
+        route_key = get_route_key(yaramo_route)
+        edges = segments_by_route_key[route_key]
+        start_signal = yaramo_route.start_signal.name
+        approach_segment = approach_segments.get(start_signal)
+        if approach_segment is None:
+            # Nothing ends at the start signal, trains are inserted behind it
+            fake_routes[f"route_{route_key}"] = FakeRoute(f"route_{route_key}", edges)
+            continue
+        if len(edges) == 0 or edges[0] != approach_segment:
+            edges = [approach_segment] + edges
+        fake_routes[f"route_{route_key}"] = FakeRoute(f"route_{route_key}", edges, start_signal)
+    return fake_routes
@@ -1,9 +1,8 @@
 import json
 import logging
 
-from py import log
 from model import Station, StationDirection, Route
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 class MetadataController(object):
@@ -12,13 +11,16 @@ class MetadataController(object):
         self.stations: Dict[str, Station] = {}
 
     def load_metadata(self, metadata_file_name, routes: List[Route]):
+        routes_by_signals: Dict[Tuple[str, str], Route] = {}
+        for route in routes:
+            signals = (route.yaramo_route.start_signal.name, route.yaramo_route.end_signal.name) # type: ignore
+            routes_by_signals.setdefault(signals, route)
+
         def _get_route_by_signals(start_signal, end_signal) -> Route | None:
-            for route in routes:
-                if route.yaramo_route.start_signal.name == start_signal and \
-                   route.yaramo_route.end_signal.name == end_signal: # type: ignore
-                    return route
-            logging.error(f"Route from {start_signal} to {end_signal} not found in topology")
-            return None
+            route = routes_by_signals.get((start_signal, end_signal))
+            if route is None:
+                logging.error(f"Route from {start_signal} to {end_signal} not found in topology")
+            return route
 
         with open(metadata_file_name, 'r') as f:
             metadata_json = json.load(f)
@@ -36,6 +38,5 @@ class MetadataController(object):
                         found_route = _get_route_by_signals(route["start_signal"], route["end_signal"])
                         if found_route is not None:
                             station_direction.routes.append(found_route)
-                    station.platforms[platform_number].append(station_direction)
+                    station.add_direction(platform_number, station_direction)
             self.stations[station.name] = station
-
@@ -1,4 +1,5 @@
-from .train import Train
+from .train import Train, TrainState
 from .trainoperation import TrainOperation
 from .station import Station, StationDirection
 from .route import Route
+from .interner import Interner, UNDEFINED_ID
@@ -0,0 +1,27 @@
+from typing import Dict, List
+
+UNDEFINED_ID = -1
+
+
+class Interner(object):
+    """Maps names, e.g. segment ids, to consecutive integers, so that the step loop compares ints instead of strings"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        interned_id = self.ids.get(name)
+        if interned_id is None:
+            interned_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return interned_id
+
+    def get_id(self, name: str) -> int:
+        return self.ids.get(name, UNDEFINED_ID)
+
+    def get_name(self, interned_id: int) -> str:
+        return self.names[interned_id] if interned_id != UNDEFINED_ID else "undefined"
+
+    def __len__(self):
+        return len(self.names)
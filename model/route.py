@@ -1,3 +1,5 @@
+from typing import List
+from .interner import UNDEFINED_ID
 from yaramo.model import Route as YaramoRoute
 
 class Route:
@@ -6,4 +8,6 @@ class Route:
         self.identifier = str(yaramo_route)
         self.available_in_sumo: bool = available_in_sumo
         self.last_segment_of_route: str = "undefined"
+        self.last_segment_id: int = UNDEFINED_ID  # Interned last_segment_of_route
+        self.segments: List[str] = []  # Segment ids in driving direction, taken from the SUMO route
 
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from .route import Route
 
 class StationDirection(object):
@@ -14,9 +14,13 @@ class Station(object):
     def __init__(self, name):
         self.name = name
         self.platforms: Dict[str, List[StationDirection]] = dict()
+        # (platform, to_station, to_platform) -> routes, the first direction added wins like in a linear search
+        self.routes_by_direction: Dict[Tuple[str, str, int], List[Route]] = dict()
+
+    def add_direction(self, platform, station_direction: StationDirection):
+        self.platforms.setdefault(str(platform), []).append(station_direction)
+        key = (str(platform), station_direction.to_station, station_direction.to_platform)
+        self.routes_by_direction.setdefault(key, station_direction.routes)
 
     def get_routes(self, platform, to_station, to_platform):
-        for station_direction in self.platforms[str(platform)]:
-            if station_direction.to_station == to_station.name and station_direction.to_platform == to_platform:
-                return station_direction.routes
-        return None
+        return self.routes_by_direction.get((str(platform), to_station.name, to_platform))
@@ -1,9 +1,24 @@
+from enum import Enum
 from typing import Optional
 from .route import Route
 from .trainoperation import TrainOperation
+from .interner import UNDEFINED_ID
+
+
+class TrainState(Enum):
+    WAITING_TO_DEPART = 0  # Not in the simulation yet, departure is scheduled
+    RUNNING = 1
+    AT_ROUTE_END = 2  # Reached the last segment of the current route
+    DWELLING = 3  # Stopped in a station, departure is scheduled
+    BLOCKED = 4  # Waiting for a route that is currently (partially) blocked
+    FINISHED = 5
 
 
 class Train(object):
+    # Fixed attributes keep trains small in large fleets
+    __slots__ = ("name", "train_type", "min_time_in_station", "max_speed", "operations", "operation_counter", "state",
+                 "blocked_in", "in_simulation", "current_position", "position_id", "current_route", "reserved_route",
+                 "previous_route")
 
     def __init__(self, name):
         self.name = name
@@ -14,9 +29,14 @@ class Train(object):
         self.operations = []
         self.operation_counter = 0
 
+        self.state = TrainState.WAITING_TO_DEPART
+        self.blocked_in: Optional[TrainState] = None  # State to continue with, once the blocked route is free
         self.in_simulation = False
         self.current_position = "undefined"
+        self.position_id = UNDEFINED_ID  # Interned current_position, compared in every step
         self.current_route: Optional[Route] = None
+        self.reserved_route: Optional[Route] = None  # Next route, set ahead of the end of the current route
+        self.previous_route: Optional[Route] = None  # Route the train is still leaving, freed once it is left
 
     def has_more_operations(self) -> bool:
         return self.operation_counter + 1 < len(self.operations)
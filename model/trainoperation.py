@@ -1,13 +1,46 @@
-import time
-import datetime
-from typing import Optional, List
+from typing import List
 from .station import Station
 from .route import Route
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_hstring(hstring: str) -> int:
+    """Parses HH:MM:SS into seconds since midnight.
+
+    Times past midnight can be given with hours beyond 23 (e.g. 25:30:00) or with a day prefix
+    (e.g. +1 01:30:00) for multi-day schedules, times before midnight with a negative day prefix
+    (e.g. -1 23:00:00).
+    """
+    days = 0
+    if hstring.startswith(("+", "-")):
+        day_string, hstring = hstring.split(" ", 1)
+        days = int(day_string)
+    hours, minutes, seconds = hstring.split(":")
+    hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+    if hours < 0 or not 0 <= minutes < 60 or not 0 <= seconds < 60:
+        raise ValueError(f"Invalid time {hstring}")
+    return days * SECONDS_PER_DAY + hours * 3600 + minutes * 60 + seconds
+
+
+def format_hstring(seconds) -> str:
+    """Formats seconds since midnight as HH:MM:SS, with a day prefix (e.g. +1 01:30:00) for other days"""
+    days, seconds = divmod(int(seconds), SECONDS_PER_DAY)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    hstring = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    if days == 0:
+        return hstring
+    return f"{days:+d} {hstring}"
+
+
 base_time = "10:00:00"
+base_offset = parse_hstring(base_time)  # Simulation time 0 corresponds to base_time
 
 
 class TrainOperation(object):
+    __slots__ = ("from_station", "from_platform", "to_station", "to_platform", "departure", "departed", "planned_departure",
+                 "actual_departure", "arrived", "arrival", "actual_arrival", "routes", "current_route_counter")
 
     def __init__(self):
         self.from_station: Station | None = None
@@ -39,19 +72,8 @@ class TrainOperation(object):
     def set_arrival(self, arrival):
         self.arrival = self.recalc_timestamp(arrival)
 
-    def recalc_timestamp(self, timestamp):
-        ts = time.strptime(timestamp, '%H:%M:%S')
-        ts_s = datetime.timedelta(hours=ts.tm_hour, minutes=ts.tm_min, seconds=ts.tm_sec).total_seconds()
-
-        base_ts = time.strptime(base_time, '%H:%M:%S')
-        base_s = datetime.timedelta(hours=base_ts.tm_hour, minutes=base_ts.tm_min,
-                                    seconds=base_ts.tm_sec).total_seconds()
-
-        return ts_s - base_s
+    def recalc_timestamp(self, timestamp) -> int:
+        return parse_hstring(timestamp) - base_offset
 
-    def timestamp_to_hstring(self, timestamp):
-        base_ts = time.strptime(base_time, '%H:%M:%S')
-        base_s = datetime.timedelta(hours=base_ts.tm_hour, minutes=base_ts.tm_min,
-                                    seconds=base_ts.tm_sec).total_seconds()
-        d = datetime.datetime.fromtimestamp(timestamp+base_s-3600)
-        return d.strftime("%H:%M:%S")
+    def timestamp_to_hstring(self, timestamp) -> str:
+        return format_hstring(timestamp + base_offset)
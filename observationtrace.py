@@ -0,0 +1,233 @@
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from traci import constants as tc
+from faketraci import _Domain
+from routeconflictmatrix import get_route_key
+from vehiclestateobserver import VehicleStateObserver
+from interlocking.model.helper import InterlockingOperation
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+def get_operation_record(time, operation: InterlockingOperation) -> Dict:
+    """Comparable record of an interlocking operation, without the objects it refers to"""
+    record = {"op": operation.operation_type.name, "t": time}
+    for name, value in vars(operation).items():
+        if isinstance(value, str):
+            record[name] = value
+        elif name == "yaramo_route" and value is not None:
+            record["route"] = get_route_key(value)
+    return record
+
+
+class ObservationRecorder(object):
+    """Records what the controller observes of SUMO in every step, and the operations it submits.
+
+    The trace is written as JSON-Lines: one setup record with the edges, routes, vehicle types and
+    segment lengths the controller reads from SUMO and the configuration of the controller, one record
+    per simulation step with the departed and arrived vehicles and the vehicles whose road, speed or
+    stop state changed, and one record per submitted interlocking operation. Such a trace can be replayed without SUMO (see ReplayTraci) and its
+    operations are the baseline to compare the replayed operations against.
+    """
+
+    def __init__(self, file_name: Optional[str] = None, keep_operations=False, buffer_size=1 << 16):
+        self.enabled = file_name is not None or keep_operations
+        self.time: float = 0
+        self.vehicles: Dict[str, Tuple[str, float, int]] = {}
+        self.operations: List[Dict] | None = [] if keep_operations else None
+        self.setup_recorded = False
+        self._file = open(file_name, 'w', buffering=buffer_size) if file_name is not None else None
+
+    def write(self, record: Dict):
+        if self._file is not None:
+            self._file.write(json.dumps(record))
+            self._file.write("\n")
+
+    def record_setup(self, edge_ids: Iterable[str], route_edges: Dict[str, List[str]], vehicle_type_max_speeds: Dict[str, float],
+                     segment_lengths: Dict[str, float], configuration: Dict):
+        self.setup_recorded = True
+        self.write({"setup": {"edges": list(edge_ids), "routes": route_edges, "vehicle_types": vehicle_type_max_speeds,
+                              "segment_lengths": segment_lengths, "configuration": configuration}})
+
+    def record_step(self, vehicle_state: VehicleStateObserver):
+        self.time = vehicle_state.time
+        record: Dict = {"step": vehicle_state.time}
+        if len(vehicle_state.departed) > 0:
+            record["departed"] = sorted(vehicle_state.departed)
+        if len(vehicle_state.arrived) > 0:
+            record["arrived"] = sorted(vehicle_state.arrived)
+        # Only changes are written, most trains keep their road and speed over many steps
+        changed = {}
+        for vehicle_id, road_id in vehicle_state.road_ids.items():
+            observation = (road_id, vehicle_state.speeds[vehicle_id], vehicle_state.stop_states[vehicle_id])
+            if self.vehicles.get(vehicle_id) != observation:
+                self.vehicles[vehicle_id] = observation
+                changed[vehicle_id] = observation
+        gone = [vehicle_id for vehicle_id in self.vehicles if vehicle_id not in vehicle_state.road_ids]
+        for vehicle_id in gone:
+            del self.vehicles[vehicle_id]
+        if len(changed) > 0:
+            record["vehicles"] = changed
+        if len(gone) > 0:
+            record["gone"] = gone
+        self.write(record)
+
+    def record_operation(self, operation: InterlockingOperation):
+        record = get_operation_record(self.time, operation)
+        if self.operations is not None:
+            self.operations.append(record)
+        self.write(record)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.enabled = False
+
+
+def load_operations(trace_file_name) -> List[Dict]:
+    with open(trace_file_name, 'r') as f:
+        return [record for record in map(json.loads, f) if "op" in record]
+
+
+def diff_operations(baseline: List[Dict], replayed: List[Dict]) -> Dict:
+    """Compares two operation streams, reports the first operation in which they differ"""
+    first_difference = next((i for i, (baseline_operation, replayed_operation) in enumerate(zip(baseline, replayed))
+                             if baseline_operation != replayed_operation), None)
+    if first_difference is None and len(baseline) != len(replayed):
+        first_difference = min(len(baseline), len(replayed))
+    diff = {"baseline_operations": len(baseline),
+            "replayed_operations": len(replayed),
+            "equal": first_difference is None,
+            "first_difference": first_difference}
+    if first_difference is not None:
+        diff["baseline_operation"] = baseline[first_difference] if first_difference < len(baseline) else None
+        diff["replayed_operation"] = replayed[first_difference] if first_difference < len(replayed) else None
+    return diff
+
+
+class _ReplaySimulationDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getSubscriptionResults(self):
+        return {tc.VAR_TIME: self._replay.time,
+                tc.VAR_DEPARTED_VEHICLES_IDS: self._replay.departed,
+                tc.VAR_ARRIVED_VEHICLES_IDS: self._replay.arrived}
+
+    def getTime(self):
+        return self._replay.time
+
+
+class _ReplayVehicleDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getAllSubscriptionResults(self):
+        return {vehicle_id: {tc.VAR_ROAD_ID: road_id, tc.VAR_SPEED: speed, tc.VAR_STOPSTATE: stop_state}
+                for vehicle_id, (road_id, speed, stop_state) in self._replay.vehicles.items()}
+
+    def getIDList(self):
+        return tuple(self._replay.vehicles)
+
+
+class _ReplayRouteDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getIDList(self):
+        return tuple(self._replay.routes)
+
+    def getEdges(self, routeID):
+        return list(self._replay.routes[routeID])
+
+
+class _ReplayVehicleTypeDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getMaxSpeed(self, typeID):
+        # Recorded in km/h like the controller keeps them, SUMO reports m/s
+        return self._replay.vehicle_type_max_speeds[typeID] / 3.6
+
+
+class _ReplayLaneDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getLength(self, laneID):
+        return self._replay.segment_lengths[laneID.rsplit("_", 1)[0]]
+
+
+class _ReplayEdgeDomain(_Domain):
+
+    def __init__(self, replay: "ReplayTraci"):
+        self._replay = replay
+
+    def getIDList(self):
+        return tuple(self._replay.edge_ids)
+
+
+class ReplayTraci(object):
+    """Stand-in for the traci module that plays back a recorded trace instead of running SUMO.
+
+    Every simulation step delivers the observations of the next recorded step, commands of the controller
+    and the infrastructure providers are accepted and ignored. The vehicles therefore move as recorded,
+    even if the replayed controller sets its routes differently, which shows up in the operations.
+    """
+
+    def __init__(self, trace_file_name):
+        self.edge_ids: List[str] = []
+        self.routes: Dict[str, List[str]] = {}
+        self.vehicle_type_max_speeds: Dict[str, float] = {}
+        self.segment_lengths: Dict[str, float] = {}  # Only of the segments the route lookahead measured
+        self.configuration: Dict = {}  # Of the recorded controller, see SimulationController.get_configuration
+        self.steps: List[Dict] = []
+        with open(trace_file_name, 'r') as f:
+            for record in map(json.loads, f):
+                if "step" in record:
+                    self.steps.append(record)
+                elif "setup" in record and len(self.steps) == 0:
+                    self.edge_ids = record["setup"]["edges"]
+                    self.routes = record["setup"]["routes"]
+                    self.vehicle_type_max_speeds = record["setup"]["vehicle_types"]
+                    self.segment_lengths = record["setup"]["segment_lengths"]
+                    self.configuration = record["setup"]["configuration"]
+        self.end_time = self.steps[-1]["step"] if len(self.steps) > 0 else 0
+        self.step_counter = 0
+        self.time: float = 0
+        self.departed: Tuple[str, ...] = ()
+        self.arrived: Tuple[str, ...] = ()
+        self.vehicles: Dict[str, Tuple[str, float, int]] = {}
+
+        self.simulation = _ReplaySimulationDomain(self)
+        self.vehicle = _ReplayVehicleDomain(self)
+        self.route = _ReplayRouteDomain(self)
+        self.edge = _ReplayEdgeDomain(self)
+        self.vehicletype = _ReplayVehicleTypeDomain(self)
+        self.trafficlight = _Domain()
+        self.gui = _Domain()
+        self.lane = _ReplayLaneDomain(self)
+
+    def simulationStep(self, step=0.0):
+        if self.step_counter == len(self.steps):
+            raise ValueError(f"The trace ends at {self.end_time}, it can not be replayed further")
+        record = self.steps[self.step_counter]
+        self.step_counter += 1
+        self.time = record["step"]
+        self.departed = tuple(record.get("departed", ()))
+        self.arrived = tuple(record.get("arrived", ()))
+        for vehicle_id in record.get("gone", ()):
+            del self.vehicles[vehicle_id]
+        for vehicle_id, observation in record.get("vehicles", {}).items():
+            self.vehicles[vehicle_id] = tuple(observation)  # type: ignore
+
+    def close(self):
+        self.vehicles.clear()
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Iterable, List
+from interlocking.model.helper import InterlockingOperation
+from stepprofiler import StepProfiler
+from observationtrace import ObservationRecorder
+
+
+class OperationQueue(asyncio.Queue):
+    """Operations queue of the interlocking that hands out a future for every submitted operation.
+
+    The interlocking consumes the queue in FIFO order and calls task_done once per operation, so the
+    future of an operation is resolved as soon as the interlocking has processed it. Submitting does not
+    wait for the queue to drain: operations of different trains can be in flight at the same time while
+    the operations of one train (count-out before count-in, set before free) keep their submission order.
+    """
+
+    def __init__(self, profiler: StepProfiler | None = None):
+        super().__init__()
+        self._pending: Deque[asyncio.Future] = deque()
+        self.profiler = profiler
+        self.number_of_operations = 0
+        self.observation_recorder: ObservationRecorder | None = None
+
+    def put_nowait(self, item):
+        super().put_nowait(item)
+        self.number_of_operations += 1
+        if self.observation_recorder is not None and self.observation_recorder.enabled:
+            self.observation_recorder.record_operation(item)
+        self._pending.append(asyncio.get_running_loop().create_future())
+
+    def task_done(self):
+        super().task_done()
+        if len(self._pending) > 0:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(None)
+
+    def submit(self, operation: InterlockingOperation) -> asyncio.Future:
+        self.put_nowait(operation)
+        future = self._pending[-1]
+        if self.profiler is not None and self.profiler.enabled:
+            self._measure_latency(operation, future)
+        return future
+
+    def _measure_latency(self, operation: InterlockingOperation, future: asyncio.Future):
+        name = f"interlocking {operation.operation_type.name}"
+        submit_time = time.perf_counter()
+        future.add_done_callback(lambda _: self.profiler.record(name, time.perf_counter() - submit_time))  # type: ignore
+
+    def submit_batch(self, operations: Iterable[InterlockingOperation]) -> List[asyncio.Future]:
+        return [self.submit(operation) for operation in operations]
+
+    async def flush(self):
+        # Operations are processed in order, so the last pending future resolves after all others
+        if len(self._pending) > 0:
+            await self._pending[-1]
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+from controller import Controller, compile_scenario, create_controller, create_sumo_scenario, get_sumo_config_file_name
+from observationtrace import ObservationRecorder, ReplayTraci, diff_operations, load_operations
+from routeconflictmatrix import RouteConflictMatrix
+from scenariocache import ScenarioCache
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+
+def create_replay_controller(plan_pro_file_name, plan_pro_version_name, metadata_file_name, replay_traci: ReplayTraci,
+                             generate_routes=False) -> Controller:
+    """Creates a controller on the recorded observations, configured like the controller that recorded them"""
+    scenario_cache = ScenarioCache(plan_pro_file_name, plan_pro_version_name, generate_routes)
+    compiled_scenario = compile_scenario(plan_pro_file_name, plan_pro_version_name, generate_routes, scenario_cache)
+    if compiled_scenario is None:
+        raise RuntimeError(f"Error importing PlanPro file {plan_pro_file_name}")
+    topology = compiled_scenario.topology
+    # Only for the vehicle types, SUMO itself is not started
+    if not Path(get_sumo_config_file_name(topology)).is_file():
+        create_sumo_scenario(topology)
+    configuration = replay_traci.configuration
+    route_conflict_matrix = None
+    if configuration.get("route_conflict_matrix", False):
+        route_conflict_matrix = RouteConflictMatrix.load_or_compute(topology, plan_pro_file_name, plan_pro_version_name, generate_routes)
+    controller = create_controller(topology, metadata_file_name, replay_traci, set(replay_traci.routes), real_time_factor=None,
+                                   wake_order=configuration.get("wake_order", "fifo"), route_conflict_matrix=route_conflict_matrix)
+    controller.simulation_controller.vehicle_type_max_speeds.update(replay_traci.vehicle_type_max_speeds)
+    controller.simulation_controller.skip_idle_time = configuration.get("skip_idle_time", True)
+    controller.set_route_lookahead(configuration.get("route_lookahead", 0), configuration.get("route_lookahead_unit", "segments"))
+    return controller
+
+
+async def replay_trace(controller: Controller, replay_traci: ReplayTraci, schedule_file_names: List[str],
+                       output_file_name: str | None = None) -> List[Dict]:
+    """Runs the schedules against the recorded observations and returns the submitted operations"""
+    observation_recorder = ObservationRecorder(output_file_name, keep_operations=True)
+    controller.record_observations(observation_recorder)
+    await controller.run_schedules(schedule_file_names, replay_traci.end_time)
+    return observation_recorder.operations  # type: ignore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded trace without SUMO and compare the interlocking operations")
+    parser.add_argument("plan_pro_file", help="Path to the PlanPro file")
+    parser.add_argument("plan_pro_version", help="Version of the PlanPro file")
+    parser.add_argument("metadata_file", help="Path to the metadata file")
+    parser.add_argument("trace_file", help="Trace recorded with controller.py --record")
+    parser.add_argument("--schedule", "-s", action="append", default=[], help="Schedule of the recorded run, can be given several times")
+    parser.add_argument("--generate-routes", "-g", action="store_true", help="Generate routes from the PlanPro file")
+    parser.add_argument("--baseline", default=None, help="Compare against the operations of this trace instead of the replayed one")
+    parser.add_argument("--output", default=None, help="Record the replay to this file, e.g. as a new baseline")
+    parser.add_argument("--report", default=None, help="Write the comparison to this JSON file")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Level of the log output")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    replay_traci = ReplayTraci(args.trace_file)
+    controller = create_replay_controller(args.plan_pro_file, args.plan_pro_version, args.metadata_file, replay_traci,
+                                          args.generate_routes)
+    start_wall_time = time.monotonic()
+    operations = asyncio.run(replay_trace(controller, replay_traci, args.schedule, args.output))
+    wall_time = time.monotonic() - start_wall_time
+
+    diff = diff_operations(load_operations(args.baseline if args.baseline is not None else args.trace_file), operations)
+    diff["steps"] = replay_traci.step_counter
+    diff["steps_per_second"] = replay_traci.step_counter / max(wall_time, 1e-6)
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(diff, f, indent=2)
+    logger.info(f"Replayed {diff['steps']} steps with {diff['replayed_operations']} operations "
+                f"({diff['steps_per_second']:.0f} steps/s)")
+    if not diff["equal"]:
+        logger.error(f"Operations differ from the baseline at operation {diff['first_difference']}: "
+                     f"expected {diff['baseline_operation']}, got {diff['replayed_operation']}")
+    sys.exit(0 if diff["equal"] else 1)
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from interlocking.interlockinginterface import Interlocking
+from interlocking.infrastructureprovider import LoggingInfrastructureProvider
+from yaramo.model import Topology, Route as YaramoRoute
+from cacheutils import get_package_version, hash_file, with_recursion_limit
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = ".cache/route-conflicts"
+
+
+def get_route_key(yaramo_route: YaramoRoute) -> str:
+    # Same naming as the SUMO routes, stable across imports and route generation runs
+    return f"{yaramo_route.start_signal.name}-{yaramo_route.end_signal.name}"  # type: ignore
+
+
+# State of the worker processes when the matrix is computed in a process pool
+_worker_interlocking: Optional[Interlocking] = None
+_worker_routes: List[YaramoRoute] = []
+
+
+def _init_worker(topology_data: bytes, route_keys: List[str]):
+    global _worker_interlocking, _worker_routes
+    topology: Topology = with_recursion_limit(lambda: pickle.loads(topology_data))
+    _worker_interlocking = Interlocking([LoggingInfrastructureProvider()])
+    _worker_interlocking.prepare(topology)
+    routes_by_key = {get_route_key(route): route for route in topology.routes.values()}
+    _worker_routes = [routes_by_key[route_key] for route_key in route_keys]
+
+
+def _compute_row(index: int) -> Tuple[int, int]:
+    return index, _compute_row_with(_worker_interlocking, _worker_routes, index)
+
+
+def _compute_row_with(interlocking, routes: List[YaramoRoute], index: int) -> int:
+    # Only the upper triangle, the matrix is symmetric
+    row = 0
+    for other_index in range(index + 1, len(routes)):
+        if interlocking.do_two_routes_collide(routes[index], routes[other_index]):
+            row |= 1 << other_index
+    return row
+
+
+class RouteConflictMatrix(object):
+    """Symmetric matrix of colliding routes, stored as one bitset per route.
+
+    Routes are identified by their start and end signal names. Bit j of the row of route i is set, if
+    route i and route j collide.
+    """
+
+    def __init__(self, route_keys: List[str], conflicts: List[int]):
+        self.route_keys: List[str] = route_keys
+        self.index_of_route: Dict[str, int] = {route_key: i for i, route_key in enumerate(route_keys)}
+        self.conflicts: List[int] = conflicts
+
+    def do_two_routes_collide(self, yaramo_route: YaramoRoute, yaramo_route2: YaramoRoute) -> bool:
+        index = self.index_of_route[get_route_key(yaramo_route)]
+        index2 = self.index_of_route[get_route_key(yaramo_route2)]
+        return (self.conflicts[index] >> index2) & 1 == 1
+
+    def get_conflicting_route_keys(self, yaramo_route: YaramoRoute) -> List[str]:
+        row = self.conflicts[self.index_of_route[get_route_key(yaramo_route)]]
+        return [route_key for i, route_key in enumerate(self.route_keys) if (row >> i) & 1 == 1]
+
+    def get_conflicting_pairs(self) -> List[Tuple[str, str]]:
+        pairs = []
+        for i, row in enumerate(self.conflicts):
+            for j in range(i + 1, len(self.route_keys)):
+                if (row >> j) & 1 == 1:
+                    pairs.append((self.route_keys[i], self.route_keys[j]))
+        return pairs
+
+    @classmethod
+    def compute(cls, topology: Topology, processes: int = 1) -> "RouteConflictMatrix":
+        routes_by_key = {get_route_key(route): route for route in topology.routes.values()}
+        route_keys = sorted(routes_by_key.keys())
+        logger.info(f"Compute route conflicts of {len(route_keys)} routes")
+
+        upper_rows = [0] * len(route_keys)
+        if processes > 1:
+            # Pickled here, the executor would pickle the topology without the raised recursion limit
+            topology_data = with_recursion_limit(lambda: pickle.dumps(topology, protocol=pickle.HIGHEST_PROTOCOL))
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(topology_data, route_keys)) as executor:
+                for index, row in executor.map(_compute_row, range(len(route_keys)), chunksize=16):
+                    upper_rows[index] = row
+        else:
+            interlocking = Interlocking([LoggingInfrastructureProvider()])
+            interlocking.prepare(topology)
+            routes = [routes_by_key[route_key] for route_key in route_keys]
+            for index in range(len(route_keys)):
+                upper_rows[index] = _compute_row_with(interlocking, routes, index)
+
+        # Mirror the upper triangle
+        conflicts = list(upper_rows)
+        for i, row in enumerate(upper_rows):
+            for j in range(i + 1, len(route_keys)):
+                if (row >> j) & 1 == 1:
+                    conflicts[j] |= 1 << i
+        return cls(route_keys, conflicts)
+
+    @classmethod
+    def load_or_compute(cls, topology: Topology, plan_pro_file_name, *cache_key_extra, cache_dir=DEFAULT_CACHE_DIR,
+                        processes: int = 1) -> "RouteConflictMatrix":
+        """Loads the matrix from the cache, keyed by a hash of the PlanPro file, or computes and caches it"""
+        # Conflicts are computed by the interlocking, another version may find other ones
+        cache_key = hash_file(plan_pro_file_name, CACHE_FORMAT_VERSION, get_package_version("interlocking"), *cache_key_extra)
+        cache_file = Path(cache_dir) / f"{cache_key}.json"
+        route_keys = sorted(get_route_key(route) for route in topology.routes.values())
+
+        if cache_file.is_file():
+            matrix = cls.load(cache_file)
+            if matrix is not None and matrix.route_keys == route_keys:
+                logger.info(f"Loaded route conflicts from {cache_file}")
+                return matrix
+            if matrix is not None:
+                logger.warning(f"Route conflict cache {cache_file} does not match the topology, recompute")
+
+        matrix = cls.compute(topology, processes)
+        matrix.save(cache_file)
+        return matrix
+
+    @classmethod
+    def load(cls, cache_file) -> Optional["RouteConflictMatrix"]:
+        try:
+            with open(cache_file, 'r') as f:
+                cache_json = json.load(f)
+            if cache_json.get("version") != CACHE_FORMAT_VERSION:
+                return None
+            return cls(cache_json["routes"], [int(row, 16) for row in cache_json["conflicts"]])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Could not load route conflicts from {cache_file}: {e}")
+            return None
+
+    def save(self, cache_file):
+        cache_file = Path(cache_file)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Other processes may read or write the same cache file, they only ever see a complete one
+        temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_file, 'w') as f:
+            json.dump({"version": CACHE_FORMAT_VERSION,
+                       "routes": self.route_keys,
+                       "conflicts": [format(row, "x") for row in self.conflicts]}, f)
+        os.replace(temp_file, cache_file)
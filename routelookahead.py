@@ -0,0 +1,58 @@
+from typing import Dict
+import traci
+from model import Route
+
+# Units the lookahead can be given in
+LOOKAHEAD_UNITS = ["segments", "m", "s"]
+
+
+class RouteLookahead(object):
+    """Decides when a train requests the next route of its operation ahead of the end of its current route.
+
+    The distance to the end signal is measured from the start of the segment the train just entered,
+    so the next route is requested when the train enters the first segment within the lookahead:
+    counted in segments before the last segment of the route, in metres or in seconds at the current
+    speed of the train. A lookahead of 0 requests the next route only at the end of the route.
+    """
+
+    def __init__(self, lookahead: float = 0, unit="segments", traci_instance=traci):
+        if unit not in LOOKAHEAD_UNITS:
+            raise ValueError(f"Unknown lookahead unit {unit}, use one of {', '.join(LOOKAHEAD_UNITS)}")
+        self.lookahead = lookahead
+        self.unit = unit
+        self.traci_instance = traci_instance
+        self.enabled = lookahead > 0
+        self.segment_lengths: Dict[str, float] = {}
+        # Per route, distance from the start of each of its segments to its end signal
+        self.distances_to_end: Dict[str, Dict[str, float]] = {}
+
+    def get_segment_length(self, segment: str) -> float:
+        length = self.segment_lengths.get(segment)
+        if length is None:
+            length = self.segment_lengths[segment] = self.traci_instance.lane.getLength(f"{segment}_0")
+        return length
+
+    def prepare(self, route: Route):
+        distances: Dict[str, float] = {}
+        distance = 0.0
+        for i, segment in enumerate(reversed(route.segments)):
+            if self.unit == "segments":
+                # The last segment of the route is 0 segments away
+                distance = i
+            else:
+                distance += self.get_segment_length(segment)
+            distances[segment] = distance
+        self.distances_to_end[route.identifier] = distances
+
+    def is_due(self, route: Route, segment: str, speed: float) -> bool:
+        distances = self.distances_to_end.get(route.identifier)
+        if distances is None:
+            self.prepare(route)
+            distances = self.distances_to_end[route.identifier]
+        distance = distances.get(segment)
+        if distance is None:
+            return False
+        if self.unit == "s":
+            # A standing train is not going to reach the end signal soon
+            return speed > 0 and distance / speed <= self.lookahead
+        return distance <= self.lookahead
@@ -0,0 +1,86 @@
+import random
+from typing import Iterator, List, Optional, Set
+from routeconflictmatrix import RouteConflictMatrix
+
+
+class RouteSetExplorer(object):
+    """Finds sets of mutually compatible routes to simulate together.
+
+    Two routes are compatible, if they do not collide according to the route conflict matrix. Instead of
+    all 2^R subsets of routes, only the maximal sets of compatible routes (the maximal cliques of the
+    compatibility graph) or a seeded random sample of them are explored.
+    """
+
+    def __init__(self, route_conflict_matrix: RouteConflictMatrix, route_keys: Optional[List[str]] = None):
+        self.route_keys: List[str] = sorted(route_keys) if route_keys is not None else list(route_conflict_matrix.route_keys)
+        all_routes = (1 << len(self.route_keys)) - 1
+        # Compatibility bitsets over the indices of self.route_keys
+        self.compatible: List[int] = []
+        for i, route_key in enumerate(self.route_keys):
+            conflicts = route_conflict_matrix.conflicts[route_conflict_matrix.index_of_route[route_key]]
+            compatible = all_routes & ~(1 << i)
+            for j, other_route_key in enumerate(self.route_keys):
+                if (conflicts >> route_conflict_matrix.index_of_route[other_route_key]) & 1 == 1:
+                    compatible &= ~(1 << j)
+            self.compatible.append(compatible)
+
+    def get_maximal_compatible_sets(self, max_size: Optional[int] = None) -> Iterator[List[str]]:
+        """Yields all maximal sets of compatible routes (Bron-Kerbosch with pivoting).
+
+        With max_size, every compatible set of that size and every smaller maximal set is yielded once.
+        """
+        if len(self.route_keys) == 0:
+            return
+        yield from (self._to_route_keys(route_set)
+                    for route_set in self._bron_kerbosch(0, (1 << len(self.route_keys)) - 1, 0, max_size))
+
+    def _bron_kerbosch(self, current: int, candidates: int, excluded: int, max_size: Optional[int]) -> Iterator[int]:
+        if candidates == 0 and excluded == 0:
+            yield current
+            return
+        if max_size is not None and current.bit_count() >= max_size:
+            yield current
+            return
+        if candidates == 0:
+            return
+        if max_size is None:
+            pivot = max(self._indices(candidates | excluded), key=lambda i: (candidates & self.compatible[i]).bit_count())
+            branches = candidates & ~self.compatible[pivot]
+        else:
+            # Pivoting would skip non-maximal sets, which are needed once the size is bounded
+            branches = candidates
+        for i in self._indices(branches):
+            yield from self._bron_kerbosch(current | (1 << i), candidates & self.compatible[i],
+                                           excluded & self.compatible[i], max_size)
+            candidates &= ~(1 << i)
+            excluded |= 1 << i
+
+    def sample_compatible_sets(self, sample_count: int, max_size: Optional[int] = None, seed=None) -> List[List[str]]:
+        """Returns up to sample_count distinct sets of compatible routes, built greedily in random order"""
+        rng = random.Random(seed)
+        samples: Set[int] = set()
+        indices = list(range(len(self.route_keys)))
+        attempts = 0
+        while len(samples) < sample_count and attempts < sample_count * 10:
+            attempts += 1
+            rng.shuffle(indices)
+            route_set = 0
+            candidates = (1 << len(self.route_keys)) - 1
+            for i in indices:
+                if max_size is not None and route_set.bit_count() >= max_size:
+                    break
+                if (candidates >> i) & 1 == 1:
+                    route_set |= 1 << i
+                    candidates &= self.compatible[i]
+            samples.add(route_set)
+        return sorted(self._to_route_keys(route_set) for route_set in samples)
+
+    @staticmethod
+    def _indices(bitset: int) -> Iterator[int]:
+        while bitset:
+            lowest = bitset & -bitset
+            yield lowest.bit_length() - 1
+            bitset ^= lowest
+
+    def _to_route_keys(self, route_set: int) -> List[str]:
+        return [self.route_keys[i] for i in self._indices(route_set)]
@@ -0,0 +1,83 @@
+from itertools import chain, count
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from model import Train, Route
+from routeconflictmatrix import RouteConflictMatrix, get_route_key
+
+
+class RouteWaitIndex(object):
+    """Index from interlocking resources to the trains waiting for a route that uses them.
+
+    A resource is either a route (``route:<start>-<end>``) or a track segment (``segment:<id>``). Points
+    are covered by the segments next to them. Blocked trains are only woken up, when one of the resources
+    of the route they wait for is released, e.g. by FREE_ROUTE or TDS_COUNT_OUT. With a conflict matrix,
+    freeing a route also wakes up the trains waiting for a colliding route. Without a conflict matrix,
+    routes blocked by overlaps or flank protection can not be told apart, so waiting trains are woken up
+    by every release, as are trains waiting for a route with unknown segments.
+    """
+
+    ANY_RESOURCE = "*"
+
+    def __init__(self, wake_order: str = "fifo", route_conflict_matrix: Optional[RouteConflictMatrix] = None):
+        if wake_order not in ("fifo", "priority"):
+            raise ValueError(f"Unknown wake order {wake_order}, use fifo or priority")
+        self.wake_order = wake_order
+        self.route_conflict_matrix = route_conflict_matrix
+        self.waiting_trains: Dict[str, Dict[str, Train]] = {}
+        self.resources_of_train: Dict[str, List[str]] = {}
+        self.order_of_train: Dict[str, Tuple[float, int]] = {}
+        self.woken_trains: Set[str] = set()
+        self.trains: Dict[str, Train] = {}
+        self.counter = count()
+
+    def get_route_resources(self, route: Route) -> List[str]:
+        if self.route_conflict_matrix is None or len(route.segments) == 0:
+            return [self.ANY_RESOURCE]
+        return [f"route:{get_route_key(route.yaramo_route)}"] + [f"segment:{segment_id}" for segment_id in route.segments]
+
+    def add(self, train: Train, route: Route, priority: float = 0):
+        """Registers a train waiting for the given route, a lower priority value is woken first"""
+        resources = self.get_route_resources(route)
+        self.trains[train.name] = train
+        self.resources_of_train[train.name] = resources
+        sequence = next(self.counter)
+        self.order_of_train[train.name] = (priority, sequence) if self.wake_order == "priority" else (0, sequence)
+        for resource in resources:
+            self.waiting_trains.setdefault(resource, {})[train.name] = train
+
+    def remove(self, train: Train):
+        for resource in self.resources_of_train.pop(train.name, []):
+            trains = self.waiting_trains.get(resource)
+            if trains is not None:
+                trains.pop(train.name, None)
+                if len(trains) == 0:
+                    del self.waiting_trains[resource]
+        self.order_of_train.pop(train.name, None)
+        self.woken_trains.discard(train.name)
+        self.trains.pop(train.name, None)
+
+    def release(self, resources: Iterable[str]):
+        for resource in chain(resources, [self.ANY_RESOURCE]):
+            trains = self.waiting_trains.get(resource)
+            if trains is not None:
+                self.woken_trains.update(trains.keys())
+
+    def release_route(self, route: Route):
+        self.release(self.get_route_resources(route))
+        if self.route_conflict_matrix is not None:
+            self.release(f"route:{route_key}" for route_key in
+                         self.route_conflict_matrix.get_conflicting_route_keys(route.yaramo_route))
+
+    def release_segment(self, segment_id: str):
+        self.release([f"segment:{segment_id}"])
+
+    def pop_woken_trains(self) -> List[Train]:
+        """Returns the woken trains in wake order, they stay registered until they are removed"""
+        woken_trains = sorted(self.woken_trains, key=lambda train_name: self.order_of_train[train_name])
+        self.woken_trains.clear()
+        return [self.trains[train_name] for train_name in woken_trains]
+
+    def __contains__(self, train: Train) -> bool:
+        return train.name in self.trains
+
+    def __len__(self) -> int:
+        return len(self.trains)
@@ -0,0 +1,56 @@
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+from yaramo.model import Topology
+from cacheutils import get_package_version, hash_file, with_recursion_limit
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+SCENARIO_CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = ".cache/scenarios"
+
+
+class CompiledScenario(object):
+    """Result of the PlanPro import pipeline that can be reused as long as its inputs do not change.
+
+    Holds the imported topology with generated routes and updated maximum speeds. The routes available
+    in SUMO are not part of it, the SUMO route files can change without the PlanPro file changing, so
+    they are read from SUMO on every start.
+    """
+
+    def __init__(self, topology: Topology):
+        self.topology = topology
+
+
+class ScenarioCache(object):
+
+    def __init__(self, plan_pro_file_name, plan_pro_version_name, generate_routes=False, cache_dir=DEFAULT_CACHE_DIR):
+        cache_key = hash_file(plan_pro_file_name, SCENARIO_CACHE_VERSION, plan_pro_version_name, generate_routes,
+                              get_package_version("yaramo"), get_package_version("planpro-importer"),
+                              get_package_version("railway-route-generator"))
+        self.cache_file = Path(cache_dir) / f"{cache_key}.pickle"
+
+    def load(self) -> Optional[CompiledScenario]:
+        if not self.cache_file.is_file():
+            return None
+        try:
+            with open(self.cache_file, 'rb') as f:
+                compiled_scenario = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load compiled scenario from {self.cache_file}: {e}")
+            return None
+        logger.info(f"Loaded compiled scenario from {self.cache_file}")
+        return compiled_scenario
+
+    def save(self, compiled_scenario: CompiledScenario):
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            temp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_file, 'wb') as f:
+                with_recursion_limit(lambda: pickle.dump(compiled_scenario, f, protocol=pickle.HIGHEST_PROTOCOL))
+            temp_file.replace(self.cache_file)
+        except Exception as e:
+            logger.warning(f"Could not save compiled scenario to {self.cache_file}: {e}")
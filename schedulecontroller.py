@@ -1,31 +1,142 @@
 import traci
 import json
+import logging
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from typing import Dict, Iterator, Set
 from model import Train, TrainOperation
 
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+# Characters that can follow the valid beginning of a JSON number within the same number
+NUMBER_CONTINUATIONS = "0123456789.eE+-"
+
+
+def iter_json_array(f, chunk_size=1 << 16) -> Iterator:
+    """Yields the elements of a top-level JSON array one by one, without reading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    state = "start"
+    while True:
+        buffer = buffer.lstrip()
+        if buffer == "" and not eof:
+            chunk = f.read(chunk_size)
+            eof = chunk == ""
+            buffer += chunk
+            continue
+        if buffer == "":
+            raise ValueError("Unexpected end of schedule file")
+        if state == "start":
+            if buffer[0] != "[":
+                raise ValueError("Schedule file must contain a JSON array")
+            buffer = buffer[1:]
+            state = "first"
+        elif buffer[0] == "]" and state in ("first", "separator"):
+            return
+        elif state == "separator":
+            if buffer[0] != ",":
+                raise ValueError("Expected ',' between schedule entries")
+            buffer = buffer[1:]
+            state = "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = len(buffer)
+            # The value might continue in the next chunk, also a number followed by e.g. "." or "e" of its rest
+            if not eof and (end == len(buffer) or isinstance(value, (int, float)) and buffer[end] in NUMBER_CONTINUATIONS):
+                chunk = f.read(chunk_size)
+                eof = chunk == ""
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            state = "separator"
+            yield value
+
+
+def iter_schedule_json(schedule_file_name) -> Iterator[Dict]:
+    """Yields the trains of a schedule file, either a JSON array or JSON-Lines (.jsonl, .ndjson)"""
+    with open(schedule_file_name, 'r') as f:
+        if Path(schedule_file_name).suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip() != "":
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def iter_sumo_input_elements(sumo_config_file_name) -> Iterator[ElementTree.Element]:
+    """Yields the elements of the route and additional files of a SUMO config, each is cleared after use"""
+    sumo_config_dir = Path(sumo_config_file_name).parent
+    inputs = ElementTree.parse(sumo_config_file_name).getroot().find("input")
+    if inputs is None:
+        return
+    for input_name in ("route-files", "additional-files"):
+        input_element = inputs.find(input_name)
+        if input_element is None:
+            continue
+        for file_name in input_element.get("value", "").split(","):
+            if file_name.strip() == "":
+                continue
+            for _, element in ElementTree.iterparse(sumo_config_dir / file_name.strip()):
+                yield element
+                element.clear()
+
+
+def load_vehicle_types(sumo_config_file_name) -> Dict[str, float]:
+    """Reads the maximum speed (km/h) of the vehicle types from the route and additional files of a SUMO config"""
+    max_speeds: Dict[str, float] = {}
+    for element in iter_sumo_input_elements(sumo_config_file_name):
+        if element.tag == "vType" and element.get("maxSpeed") is not None:
+            max_speeds[element.get("id")] = float(element.get("maxSpeed")) * 3.6  # type: ignore
+    return max_speeds
+
+
+def load_route_ids(sumo_config_file_name) -> Set[str]:
+    """Reads the ids of the routes SUMO will load from the route and additional files of a SUMO config"""
+    return {element.get("id") for element in iter_sumo_input_elements(sumo_config_file_name)  # type: ignore
+            if element.tag == "route" and element.get("id") is not None}
+
 
 class ScheduleController(object):
 
-    def __init__(self):
+    def __init__(self, vehicle_type_max_speeds: Dict[str, float] | None = None, traci_instance=traci):
         self.trains = []
+        self.traci_instance = traci_instance
+        # Maximum speed per vehicle type in km/h, each type is looked up via TraCI at most once
+        self.vehicle_type_max_speeds: Dict[str, float] = vehicle_type_max_speeds if vehicle_type_max_speeds is not None else {}
 
     def load_schedule(self, schedule_file_name, stations):
-        schedule = None
-        with open(schedule_file_name, 'r') as f:
-            schedule = json.load(f)
-
-        # Prepare trains
-        for train_json in schedule:
-            train = Train(train_json["name"])
-            train.train_type = train_json["type"]
-            train.min_time_in_station = train_json["min_time_in_station"]
-            train.max_speed = float(traci.vehicletype.getMaxSpeed(train.train_type)) * 3.6
-            for operation_json in train_json["operations"]:
-                train_operation = TrainOperation()
-                train_operation.from_station = stations[operation_json["from"]]
-                train_operation.from_platform = operation_json["from_platform"]
-                train_operation.to_station = stations[operation_json["to"]]
-                train_operation.to_platform = operation_json["to_platform"]
-                train_operation.set_departure(operation_json["departure"])
-                train_operation.set_arrival(operation_json["arrival"])
-                train.operations.append(train_operation)
-            self.trains.append(train)
+        self.trains.extend(self.iter_schedule(schedule_file_name, stations))
+
+    def iter_schedule(self, schedule_file_name, stations) -> Iterator[Train]:
+        """Yields the trains of the schedule one by one, in the order of the file"""
+        for train_json in iter_schedule_json(schedule_file_name):
+            yield self.create_train(train_json, stations)
+
+    def get_max_speed(self, train_type) -> float:
+        max_speed = self.vehicle_type_max_speeds.get(train_type)
+        if max_speed is None:
+            max_speed = float(self.traci_instance.vehicletype.getMaxSpeed(train_type)) * 3.6
+            self.vehicle_type_max_speeds[train_type] = max_speed
+        return max_speed
+
+    def create_train(self, train_json, stations) -> Train:
+        train = Train(train_json["name"])
+        train.train_type = train_json["type"]
+        train.min_time_in_station = train_json["min_time_in_station"]
+        train.max_speed = self.get_max_speed(train.train_type)
+        for operation_json in train_json["operations"]:
+            train_operation = TrainOperation()
+            train_operation.from_station = stations[operation_json["from"]]
+            train_operation.from_platform = operation_json["from_platform"]
+            train_operation.to_station = stations[operation_json["to"]]
+            train_operation.to_platform = operation_json["to_platform"]
+            train_operation.set_departure(operation_json["departure"])
+            train_operation.set_arrival(operation_json["arrival"])
+            train.operations.append(train_operation)
+        return train
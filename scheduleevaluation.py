@@ -0,0 +1,217 @@
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from model import Train, TrainOperation
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = ["time", "train", "operation", "from", "from_platform", "to", "to_platform", "departure", "actual_departure",
+                 "departure_delay", "arrival", "actual_arrival", "arrival_delay", "inherited_delay", "wait_delay",
+                 "run_delay", "blocked_by"]
+
+
+class DelayStatistics(object):
+    """Running statistics of delays in whole seconds.
+
+    Delays are counted per second, so percentiles depend on the number of distinct delays, not on the
+    number of recorded operations.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.counts: Dict[int, int] = {}
+
+    def record(self, delay: int):
+        self.count += 1
+        self.total += delay
+        if self.min is None or delay < self.min:
+            self.min = delay
+        if self.max is None or delay > self.max:
+            self.max = delay
+        self.counts[delay] = self.counts.get(delay, 0) + 1
+
+    def percentile(self, percentile: float) -> Optional[int]:
+        if self.count == 0:
+            return None
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for delay in sorted(self.counts):
+            seen += self.counts[delay]
+            if seen >= rank:
+                return delay
+        return self.max
+
+    def get_stats(self) -> Dict:
+        return {"count": self.count,
+                "mean": self.total / self.count if self.count > 0 else None,
+                "min": self.min,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "max": self.max}
+
+
+class TrainDelays(object):
+    __slots__ = ("operations", "arrival_delay", "max_arrival_delay", "wait_delay", "caused_delay")
+
+    def __init__(self):
+        self.operations = 0
+        self.arrival_delay = 0  # Sum over all operations
+        self.max_arrival_delay = 0
+        self.wait_delay = 0  # Waiting for blocked routes
+        self.caused_delay = 0.0  # Waiting of other trains at blocked routes attributed to this train
+
+    def get_stats(self) -> Dict:
+        return {"operations": self.operations,
+                "arrival_delay": self.arrival_delay,
+                "max_arrival_delay": self.max_arrival_delay,
+                "wait_delay": self.wait_delay,
+                "caused_delay": self.caused_delay}
+
+
+class ScheduleEvaluation(object):
+    """Punctuality of the schedule, evaluated operation by operation while the simulation runs.
+
+    The departure delay of an operation is split into the delay inherited from a late arrival of the
+    previous operation and the time spent waiting for a blocked route. Every wait for a blocked route,
+    at departure or at the end of a route on the way, is measured from blocking to proceeding and
+    attributed to the trains that occupied the route when it was requested (knock-on delay). Every
+    completed operation can be written as a record to a CSV or JSON-Lines file.
+    """
+
+    def __init__(self, file_name: Optional[str] = None):
+        self.reset()
+        self._file = None
+        self._csv_writer = None
+        if file_name is not None:
+            self._file = open(file_name, 'w', newline="")
+            if Path(file_name).suffix == ".csv":
+                self._csv_writer = csv.DictWriter(self._file, fieldnames=RECORD_FIELDS)
+                self._csv_writer.writeheader()
+
+    def reset(self):
+        """Forgets all evaluated operations, the records file stays open"""
+        self.departure_delays = DelayStatistics()
+        self.arrival_delays = DelayStatistics()
+        self.station_departure_delays: Dict[str, DelayStatistics] = {}
+        self.station_arrival_delays: Dict[str, DelayStatistics] = {}
+        self.trains: Dict[str, TrainDelays] = {}
+        self.blocked_by: Dict[str, Set[str]] = {}
+        self.blocks: Dict[str, Tuple[float, List[str]]] = {}  # Per blocked train, since when and by which trains
+        self.total_wait_delay = 0
+        self.total_inherited_delay = 0
+
+    def get_train_delays(self, train_name) -> TrainDelays:
+        train_delays = self.trains.get(train_name)
+        if train_delays is None:
+            train_delays = self.trains[train_name] = TrainDelays()
+        return train_delays
+
+    def record_blocked(self, train_name, blocking_train_names: List[str], cur_time):
+        # Collected until the operation of the train is evaluated
+        self.blocked_by.setdefault(train_name, set()).update(blocking_train_names)
+        self.blocks[train_name] = (cur_time, blocking_train_names)
+
+    def record_unblocked(self, train_name, cur_time):
+        """Splits the time the train waited since it was blocked among the trains that blocked it"""
+        block = self.blocks.pop(train_name, None)
+        if block is None:
+            return
+        blocked_since, blocking_train_names = block
+        for blocking_train_name in blocking_train_names:
+            self.get_train_delays(blocking_train_name).caused_delay += (cur_time - blocked_since) / len(blocking_train_names)
+
+    def record_operation(self, train: Train, operation: TrainOperation, operation_index: int, cur_time):
+        """Evaluates an operation once the train arrived at its end"""
+        departure_delay = operation.actual_departure - operation.departure if operation.departure >= 0 else None
+        arrival_delay = operation.actual_arrival - operation.arrival if operation.arrival >= 0 else None
+        inherited_delay = max(0, operation.planned_departure - operation.departure) \
+            if operation.planned_departure >= 0 and operation.departure >= 0 else 0
+        wait_delay = max(0, operation.actual_departure - max(operation.departure, operation.planned_departure))
+        blocked_by = sorted(self.blocked_by.pop(train.name, ()))
+
+        train_delays = self.get_train_delays(train.name)
+        train_delays.operations += 1
+        train_delays.wait_delay += wait_delay
+        self.total_wait_delay += wait_delay
+        self.total_inherited_delay += inherited_delay
+        # Operations of trains driving routes without schedule have no stations
+        if departure_delay is not None:
+            self.departure_delays.record(departure_delay)
+            if operation.from_station is not None:
+                self.station_departure_delays.setdefault(operation.from_station.name, DelayStatistics()).record(departure_delay)
+        if arrival_delay is not None:
+            self.arrival_delays.record(arrival_delay)
+            if operation.to_station is not None:
+                self.station_arrival_delays.setdefault(operation.to_station.name, DelayStatistics()).record(arrival_delay)
+            train_delays.arrival_delay += arrival_delay
+            train_delays.max_arrival_delay = max(train_delays.max_arrival_delay, arrival_delay)
+
+        if self._file is not None:
+            self.write_record({"time": cur_time,
+                               "train": train.name,
+                               "operation": operation_index,
+                               "from": operation.from_station.name if operation.from_station is not None else None,
+                               "from_platform": operation.from_platform,
+                               "to": operation.to_station.name if operation.to_station is not None else None,
+                               "to_platform": operation.to_platform,
+                               "departure": operation.departure,
+                               "actual_departure": operation.actual_departure,
+                               "departure_delay": departure_delay,
+                               "arrival": operation.arrival,
+                               "actual_arrival": operation.actual_arrival,
+                               "arrival_delay": arrival_delay,
+                               "inherited_delay": inherited_delay,
+                               "wait_delay": wait_delay,
+                               "run_delay": arrival_delay - departure_delay if arrival_delay is not None and departure_delay is not None else None,
+                               "blocked_by": blocked_by})
+
+    def write_record(self, record: Dict):
+        if self._csv_writer is not None:
+            record["blocked_by"] = "|".join(record["blocked_by"])
+            self._csv_writer.writerow(record)
+        else:
+            self._file.write(json.dumps(record))  # type: ignore
+            self._file.write("\n")  # type: ignore
+
+    def get_summary(self) -> Dict:
+        """Aggregates over all operations, independent of the number of trains"""
+        return {"operations": self.arrival_delays.count,
+                "departure_delay": self.departure_delays.get_stats(),
+                "arrival_delay": self.arrival_delays.get_stats(),
+                "inherited_delay": self.total_inherited_delay,
+                "wait_delay": self.total_wait_delay}
+
+    def get_station_stats(self) -> Dict[str, Dict]:
+        station_names = sorted(set(self.station_departure_delays) | set(self.station_arrival_delays))
+        return {station_name: {"departure_delay": self.station_departure_delays.get(station_name, DelayStatistics()).get_stats(),
+                               "arrival_delay": self.station_arrival_delays.get(station_name, DelayStatistics()).get_stats()}
+                for station_name in station_names}
+
+    def get_train_stats(self) -> Dict[str, Dict]:
+        return {train_name: train_delays.get_stats() for train_name, train_delays in self.trains.items()}
+
+    def print_summary(self):
+        summary = self.get_summary()
+        logger.info("%d operations evaluated, inherited delay %d s, waiting for blocked routes %d s",
+                    summary["operations"], summary["inherited_delay"], summary["wait_delay"])
+        for name in ("departure_delay", "arrival_delay"):
+            stats = summary[name]
+            logger.info("%-16s mean %s s, p50 %s s, p95 %s s, max %s s", name, stats["mean"], stats["p50"], stats["p95"], stats["max"])
+
+    def export(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump({"summary": self.get_summary(),
+                       "stations": self.get_station_stats(),
+                       "trains": self.get_train_stats()}, f, indent=2)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._csv_writer = None
@@ -0,0 +1,47 @@
+from typing import Dict, Iterable, List
+from model import Interner, UNDEFINED_ID
+
+
+class SegmentIndex(object):
+    """Maps SUMO edge ids to interned segment ids, so the step loop needs a single dict lookup per train.
+
+    Forward edges and their ``-re`` reverse edges map to the same segment, internal edges of points
+    (``:...``) and the empty road of vehicles that are not inserted yet map to UNDEFINED_ID. The
+    segment objects of the interlocking are resolved once per segment.
+    """
+
+    def __init__(self, segment_ids: Interner, train_detection_controller):
+        self.segment_ids = segment_ids
+        self.train_detection_controller = train_detection_controller
+        self.edges: Dict[str, int] = {"": UNDEFINED_ID}
+        self.segments: List = []  # Segment of the interlocking by interned segment id, None if not resolved yet
+        self.built = False
+
+    def build(self, edge_ids: Iterable[str]):
+        for edge_id in edge_ids:
+            self.add_edge(edge_id)
+        self.built = True
+
+    def add_edge(self, edge_id: str) -> int:
+        if edge_id.startswith(":"):
+            segment_id = UNDEFINED_ID
+        else:
+            segment_id = self.segment_ids.intern(edge_id[:-3] if edge_id.endswith("-re") else edge_id)
+        self.edges[edge_id] = segment_id
+        return segment_id
+
+    def get_segment_id(self, edge_id: str) -> int:
+        segment_id = self.edges.get(edge_id)
+        if segment_id is None:
+            # Edges that were not in the network when the index was built
+            segment_id = self.add_edge(edge_id)
+        return segment_id
+
+    def get_segment(self, segment_id: int):
+        if segment_id >= len(self.segments):
+            self.segments.extend([None] * (len(self.segment_ids) - len(self.segments)))
+        segment = self.segments[segment_id]
+        if segment is None:
+            segment = self.segments[segment_id] = \
+                self.train_detection_controller.get_segment_by_segment_id(self.segment_ids.get_name(segment_id))
+        return segment
@@ -1,32 +1,69 @@
 import asyncio
-from re import I
-from typing import Dict, List
-from xxlimited import new
+import heapq
+from itertools import count
+from typing import Dict, Iterator, List, Tuple
 import traci
 import time
-from model import Train, TrainOperation, Station, Route
+from model import Train, TrainState, TrainOperation, Station, Route, Interner, UNDEFINED_ID
 from schedulecontroller import ScheduleController
+from vehiclestateobserver import VehicleStateObserver
+from operationqueue import OperationQueue
+from routewaitindex import RouteWaitIndex
+from routeconflictmatrix import RouteConflictMatrix, get_route_key
+from segmentindex import SegmentIndex
+from routelookahead import RouteLookahead
+from steptrace import StepTracer
+from observationtrace import ObservationRecorder
+from scheduleevaluation import ScheduleEvaluation
+from stepprofiler import StepProfiler
 from interlocking.interlockinginterface import Interlocking
 from interlocking.model import OccupancyState
-from interlocking.model.helper import Settings, InterlockingOperation, InterlockingOperationType
-from interlocking.infrastructureprovider import LoggingInfrastructureProvider, SUMOInfrastructureProvider, RandomWaitInfrastructureProvider
+from interlocking.model.helper import InterlockingOperation, InterlockingOperationType
+from interlocking.infrastructureprovider import SUMOInfrastructureProvider
 
 import logging
 
 # Module-level logger
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class SimulationController(object):
 
-    def __init__(self, stations: Dict[str, Station], routes: List[Route], interlocking: Interlocking, operations_queue: asyncio.Queue, sumo_infrastructure_provider: SUMOInfrastructureProvider):
+    def __init__(self, stations: Dict[str, Station], routes: List[Route], interlocking: Interlocking, operations_queue: OperationQueue, sumo_infrastructure_provider: SUMOInfrastructureProvider, real_time_factor: float | None = 1.0, wake_order: str = "fifo", route_conflict_matrix: RouteConflictMatrix | None = None, traci_instance=traci):
         self.operations_queue = operations_queue
         self.interlocking = interlocking
         self.routes = routes
         self.stations: Dict[str, Station] = stations
-        self.trains: List[Train] = []
+        self.trains: Dict[str, Train] = {}  # By name, so that finished trains are removed in constant time
         self.sumo_infrastructure_provider = sumo_infrastructure_provider
         self.finished_trains: List[Train] = []
+        self.traci_instance = traci_instance
+        self.vehicle_state = VehicleStateObserver(traci_instance)
+        # Only trains whose state can change in a step are looked at in that step
+        self.departure_queue: List[Tuple[float, int, Train]] = []  # Heap of (departure, counter, train)
+        self.departure_counter = count()
+        self.trains_in_simulation: Dict[str, Train] = {}
+        self.trains_at_route_end: Dict[str, Train] = {}
+        self.segment_ids = Interner()  # Positions are compared as interned segment ids in every step
+        self.segment_index = SegmentIndex(self.segment_ids, interlocking.train_detection_controller)
+        self.route_wait_index = RouteWaitIndex(wake_order, route_conflict_matrix)
+        self.route_lookahead = RouteLookahead(traci_instance=traci_instance)  # Disabled unless replaced
+        self.trains_in_lookahead: Dict[str, Train] = {}  # Trains that entered a segment within the lookahead in this step
+        # Heap of (departure, counter, train, stream) with the next train of each streamed schedule
+        self.schedule_streams: List[Tuple[float, int, Train, Iterator[Train]]] = []
+        self.schedule_lookahead = 60  # Seconds before their departure streamed trains are created
+        self.vehicle_type_max_speeds: Dict[str, float] = {}  # Shared by all loaded schedules
+        self.tracer = StepTracer()  # Disabled unless replaced by a tracer writing to a file
+        self.profiler = StepProfiler()  # Disabled unless replaced by an enabled profiler
+        self.schedule_evaluation = ScheduleEvaluation()  # Writes no records unless replaced by one with a file
+        self.observation_recorder = ObservationRecorder()  # Disabled unless replaced by a recorder writing to a file
+        # Simulated seconds per wall-clock second, None runs the simulation as fast as possible
+        if real_time_factor is not None and real_time_factor <= 0:
+            raise ValueError(f"The real time factor must be positive, got {real_time_factor}")
+        self.real_time_factor = real_time_factor
+        # Step SUMO in a worker thread, so that other controllers in the same event loop keep running meanwhile
+        self.step_in_thread = False
+        # Jump to the next departure while no train can move, instead of stepping through the idle time
+        self.skip_idle_time = True
 
     def add_train(self, train_name, operations, train_type="regio", max_speed=70):
         train = Train(train_name)
@@ -43,190 +80,492 @@ class SimulationController(object):
             train_operation.set_arrival(operations[i])
             train.operations.append(train_operation)
 
-        self.trains.append(train)
+        self.add_trains([train])
 
-    def load_schedule(self, schedule_file_name):
-        schedule_controller = ScheduleController()
+    def add_train_for_routes(self, train_name, routes: List[Route], departure=0, train_type="regio"):
+        """Adds a train that drives the given routes in one operation, e.g. to test routes without schedule"""
+        train = Train(train_name)
+        train.train_type = train_type
+        train_operation = TrainOperation()
+        train_operation.routes = list(routes)
+        train_operation.departure = departure
+        train.operations.append(train_operation)
+        self.add_trains([train])
+
+    def load_schedule(self, schedule_file_name, lazy=False):
+        schedule_controller = ScheduleController(self.vehicle_type_max_speeds, self.traci_instance)
+        if lazy:
+            # The schedule file is expected to be sorted by the first departure of the trains
+            logger.info(f"Streaming schedule from {schedule_file_name}")
+            self.push_next_streamed_train(schedule_controller.iter_schedule(schedule_file_name, self.stations))
+            return
         logger.info(f"Loading schedule from {schedule_file_name}")
         schedule_controller.load_schedule(schedule_file_name, self.stations)
         logger.info(f"Add {len(schedule_controller.trains)} trains from schedule to simulation")
         for train in schedule_controller.trains:
             logger.info(f"Train {train.name} with {len(train.operations)} operations")
-        self.trains.extend(schedule_controller.trains)
+        self.add_trains(schedule_controller.trains)
+
+    def push_next_streamed_train(self, schedule_stream: Iterator[Train]):
+        train = next(schedule_stream, None)
+        if train is not None:
+            heapq.heappush(self.schedule_streams, (train.get_current_operation().departure, next(self.departure_counter),
+                                                   train, schedule_stream))
+
+    def add_streamed_trains(self, cur_time):
+        # Trains of streamed schedules are created shortly before they are due
+        while len(self.schedule_streams) > 0 and self.schedule_streams[0][0] <= cur_time + self.schedule_lookahead:
+            departure, _, train, schedule_stream = heapq.heappop(self.schedule_streams)
+            if departure < cur_time:
+                logger.warning(f"Train {train.name} is streamed after its departure, is the schedule sorted by departure?")
+            self.add_trains([train])
+            self.push_next_streamed_train(schedule_stream)
+
+    def add_trains(self, trains: List[Train]):
+        for train in trains:
+            # Trains can also be added while the simulation is running
+            self.enrich_train_by_routes(train)
+            self.trains[train.name] = train
+            self.schedule_departure(train, train.get_current_operation().departure)
+
+    def submit_operation(self, operation) -> asyncio.Future:
+        return self.operations_queue.submit(operation)
 
     async def enqueue_operation(self, operation):
-        self.operations_queue.put_nowait(operation)
-        await self.operations_queue.join()
+        await self.submit_operation(operation)
+
+    async def can_route_be_set(self, route: Route, train: Train) -> bool:
+        # The decision has to see the effects of all operations submitted so far
+        with self.profiler.measure("interlocking_wait"):
+            await self.operations_queue.flush()
+        return self.interlocking.can_route_be_set(route.yaramo_route, train.name)
 
-    async def run_simulation(self):  # run the simulation until all trains are fully processed
+    async def run_simulation(self, until: float | None = None):  # run the simulation until all trains are fully processed
         self.enrich_routes_by_last_segment()
+        self.enrich_routes_by_segments()
+        if not self.segment_index.built:
+            self.segment_index.build(self.traci_instance.edge.getIDList())
+        if self.route_lookahead.enabled:
+            for route in self.routes:
+                self.route_lookahead.prepare(route)
+        if self.observation_recorder.enabled and not self.observation_recorder.setup_recorded:
+            self.observation_recorder.record_setup(self.traci_instance.edge.getIDList(),
+                                                   {self.get_sumo_route_id(route): route.segments
+                                                    for route in self.routes if route.available_in_sumo},
+                                                   self.vehicle_type_max_speeds, self.route_lookahead.segment_lengths,
+                                                   self.get_configuration())
         self.enrich_train_operations_by_routes()
-        traci.simulationStep()
-        await self.after_each_simulation_step()
-        while len(self.trains) > 0:
-            #logger.debug(f"Current simulation time: {traci.simulation.getTime()}")
-            traci.simulationStep()
+        self.vehicle_state.subscribe_simulation()
+        await self.simulation_step()
+        start_wall_time = time.monotonic()
+        start_sim_time = self.vehicle_state.time
+        while len(self.trains) > 0 or len(self.schedule_streams) > 0:
+            if until is not None and self.vehicle_state.time >= until:
+                logger.warning(f"Stop simulation at {self.vehicle_state.time} with {len(self.trains)} unfinished trains")
+                break
+            await self.simulation_step(self.get_idle_until(until))
+            await self.pace(start_wall_time, start_sim_time)
+        await self.operations_queue.flush()
+
+    def get_configuration(self) -> Dict:
+        """Settings that change the decisions of the controller, a replay has to use the same"""
+        return {"wake_order": self.route_wait_index.wake_order,
+                "route_conflict_matrix": self.route_wait_index.route_conflict_matrix is not None,
+                "route_lookahead": self.route_lookahead.lookahead,
+                "route_lookahead_unit": self.route_lookahead.unit,
+                "skip_idle_time": self.skip_idle_time}
+
+    async def simulation_step(self, target_time: float = 0.0):
+        if not self.profiler.enabled:
+            await self.step_sumo(target_time)
             await self.after_each_simulation_step()
-            await asyncio.sleep(traci.simulation.getDeltaT())
+            return
+        step_start = time.perf_counter()
+        await self.step_sumo(target_time)
+        sumo_step_end = time.perf_counter()
+        await self.after_each_simulation_step()
+        self.profiler.record_step(sumo_step_end - step_start, time.perf_counter() - step_start)
+
+    async def step_sumo(self, target_time: float = 0.0):
+        # A target time of 0, or one that is not ahead, performs exactly one step
+        if self.step_in_thread:
+            # The interlocking must not use the connection while the worker thread does
+            await self.operations_queue.flush()
+            await asyncio.to_thread(self.traci_instance.simulationStep, target_time)
+        else:
+            self.traci_instance.simulationStep(target_time)
+
+    def get_idle_until(self, until: float | None = None) -> float:
+        """Time of the next departure, if no train can move before, otherwise 0 for a single step.
+
+        Trains only start moving at a departure, either into the simulation, after dwelling or after
+        a woken retry. While every train in the simulation stands still dwelling or blocked, nothing
+        happens before the next departure, so the steps in between do not need to be looked at.
+        """
+        if not self.skip_idle_time or len(self.trains_at_route_end) > 0 or len(self.route_wait_index.woken_trains) > 0:
+            return 0.0
+        for train in self.trains_in_simulation.values():
+            if train.state not in (TrainState.DWELLING, TrainState.BLOCKED) or self.vehicle_state.get_speed(train.name) > 0:
+                return 0.0
+        next_event_times = []
+        if len(self.departure_queue) > 0:
+            next_event_times.append(self.departure_queue[0][0])
+        if len(self.schedule_streams) > 0:
+            next_event_times.append(self.schedule_streams[0][0] - self.schedule_lookahead)
+        if len(next_event_times) == 0:
+            # Only blocked trains are left, they are not woken by time
+            return 0.0
+        if until is not None:
+            next_event_times.append(until)
+        target_time = min(next_event_times)
+        if target_time <= self.vehicle_state.time:
+            return 0.0
+        if self.tracer.debug_enabled:
+            self.tracer.trace(self.vehicle_state.time, "idle", until=target_time)
+        return target_time
+
+    async def pace(self, start_wall_time, start_sim_time):
+        if self.real_time_factor is None:
+            # Only yield, so that the interlocking can process its operations
+            await asyncio.sleep(0)
+            return
+        target_wall_time = start_wall_time + (self.vehicle_state.time - start_sim_time) / self.real_time_factor
+        await asyncio.sleep(max(0.0, target_wall_time - time.monotonic()))
 
     def enrich_routes_by_last_segment(self):
         for route in self.routes:
             interlocking_route = self.interlocking.get_route_from_yaramo_route(route.yaramo_route)
             route.last_segment_of_route = interlocking_route.get_last_segment_of_route().segment_id
+            route.last_segment_id = self.segment_ids.intern(route.last_segment_of_route)
+
+    def enrich_routes_by_segments(self):
+        for route in self.routes:
+            if route.available_in_sumo and len(route.segments) == 0:
+                edges = self.traci_instance.route.getEdges(self.get_sumo_route_id(route))
+                route.segments = [edge[:-3] if edge.endswith("-re") else edge for edge in edges if not edge.startswith(":")]
 
     def enrich_train_operations_by_routes(self):
-        for train in self.trains:
-            for operation in train.operations:
-                routes = operation.from_station.get_routes(operation.from_platform, operation.to_station,
-                                                                         operation.to_platform)
-                if routes is None:
-                    logger.error(f"Route from {operation.from_station.name} platform {operation.from_platform} to {operation.to_station.name} platform {operation.to_platform} not found")
-                    break  # TODO: Train cannot start
-                logger.debug(f"Found {len(routes)} routes from {operation.from_station.name} platform {operation.from_platform} to {operation.to_station.name} platform {operation.to_platform}")
-                operation.routes = routes
+        for train in self.trains.values():
+            self.enrich_train_by_routes(train)
+
+    def enrich_train_by_routes(self, train: Train):
+        for operation in train.operations:
+            if len(operation.routes) > 0:
+                continue
+            routes = operation.from_station.get_routes(operation.from_platform, operation.to_station,
+                                                                     operation.to_platform)
+            if routes is None:
+                logger.error(f"Route from {operation.from_station.name} platform {operation.from_platform} to {operation.to_station.name} platform {operation.to_platform} not found")
+                break  # TODO: Train cannot start
+            logger.debug("Found %d routes from %s platform %s to %s platform %s", len(routes), operation.from_station.name,
+                         operation.from_platform, operation.to_station.name, operation.to_platform)
+            operation.routes = routes
 
     def get_sumo_route_id(self, route: Route) -> str:
         return f"route_{route.identifier.replace('->', '-')}"
 
+    def set_sumo_route(self, train: Train, route: Route):
+        with self.profiler.measure("traci_commands"):
+            self.traci_instance.vehicle.setRouteID(train.name, self.get_sumo_route_id(route))
+
     async def after_each_simulation_step(self):
-        cur_time = int(traci.simulation.getTime())
+        with self.profiler.measure("traci_queries"):
+            self.vehicle_state.update()
+        if self.observation_recorder.enabled:
+            self.observation_recorder.record_step(self.vehicle_state)
+        cur_time = int(self.vehicle_state.time)
+        if self.tracer.debug_enabled:
+            for vehicle_id in self.vehicle_state.departed:
+                self.tracer.trace(cur_time, "departed", train=vehicle_id)
+
+        self.update_train_positions(cur_time)
 
-        # Update train positions
+        # Trains close to the end of their route request their next route ahead
+        for train in list(self.trains_in_lookahead.values()):
+            await self.reserve_next_route(train)
+        self.trains_in_lookahead.clear()
+
+        # Trains at the end of their route continue with the next route or stop in the station
+        for train in list(self.trains_at_route_end.values()):
+            if not await self.proceed(train, cur_time):
+                del self.trains_at_route_end[train.name]
+                self.block(train)
+
+        # Blocked trains are only retried, if a resource of the route they wait for was released
+        for train in self.route_wait_index.pop_woken_trains():
+            train.state = train.blocked_in
+            if await self.proceed(train, cur_time):
+                self.route_wait_index.remove(train)
+                self.schedule_evaluation.record_unblocked(train.name, cur_time)
+            else:
+                train.state = TrainState.BLOCKED
+
+        self.add_streamed_trains(cur_time)
+
+        # Departures that are due, either into the simulation or after dwelling in a station
+        while len(self.departure_queue) > 0 and self.departure_queue[0][0] <= cur_time:
+            _, _, train = heapq.heappop(self.departure_queue)
+            if train.state not in (TrainState.WAITING_TO_DEPART, TrainState.DWELLING):
+                continue
+            if not await self.proceed(train, cur_time):
+                self.block(train)
+
+    def update_train_positions(self, cur_time):
+        # Occupancy changes of all trains are submitted as one batch
+        occupancy_operations = []
         to_remove = []
-        for train in self.trains:
-            if train.in_simulation:
-                old_position = train.current_position
-                if train.name not in traci.vehicle.getIDList():
-                    if old_position != "undefined":
-                        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.TDS_COUNT_OUT,
-                                                                                train.name,
-                                                                                segment_id=old_position,
-                                                                                infrastructure_provider=self.sumo_infrastructure_provider))
-                    if len(train.operations) > 0:
-                        train.operations[-1].actual_arrival = cur_time
-                    to_remove.append(train)
-                else:
-                    new_position = traci.vehicle.getRoadID(train.name)
-                    if new_position.startswith(":"):  # Point internal edges will be ignored
-                        continue
-                    if new_position.endswith("-re"):
-                        new_position = new_position[:-3]
-                    if old_position != "undefined" and new_position != old_position:
-                        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.TDS_COUNT_OUT,
-                                                                                train.name,
-                                                                                segment_id=old_position,
-                                                                                infrastructure_provider=self.sumo_infrastructure_provider))
-                        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.TDS_COUNT_IN,
-                                                                                train.name,
-                                                                                segment_id=new_position,
-                                                                                infrastructure_provider=self.sumo_infrastructure_provider))
-                        train.current_position = new_position
-                    elif old_position == "undefined":
-                        # Reserve segment before first signal
-                        segment = self.interlocking.train_detection_controller.get_segment_by_segment_id(new_position)
-                        segment.used_by.add(train.name)
-                        segment.state = OccupancyState.RESERVED
-
-                        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.TDS_COUNT_IN,
-                                                                                train.name,
-                                                                                segment_id=new_position,
-                                                                                infrastructure_provider=self.sumo_infrastructure_provider))
-                        train.current_position = new_position
+        for vehicle_id in self.vehicle_state.arrived:
+            train = self.trains_in_simulation.get(vehicle_id)
+            if train is None:
+                continue
+            if train.position_id != UNDEFINED_ID:
+                self.route_wait_index.release_segment(train.current_position)
+                occupancy_operations.append(InterlockingOperation(InterlockingOperationType.TDS_COUNT_OUT,
+                                                                  train.name,
+                                                                  segment_id=train.current_position,
+                                                                  infrastructure_provider=self.sumo_infrastructure_provider))
+            if len(train.operations) > 0:
+                train.operations[-1].actual_arrival = cur_time
+                self.schedule_evaluation.record_operation(train, train.operations[-1], len(train.operations) - 1, cur_time)
+            to_remove.append(train)
+        for train in to_remove:
+            del self.trains_in_simulation[train.name]
+
+        for train in self.trains_in_simulation.values():
+            # Not inserted yet and point internal edges have no segment
+            new_position_id = self.segment_index.get_segment_id(self.vehicle_state.get_road_id(train.name))
+            if new_position_id == UNDEFINED_ID or new_position_id == train.position_id:
+                continue
+            old_position = train.current_position
+            new_position = self.segment_ids.get_name(new_position_id)
+            if train.previous_route is not None:
+                # The train left the last segment of its previous route
+                self.free_route(train, train.previous_route)
+                train.previous_route = None
+            if train.position_id != UNDEFINED_ID:
+                self.route_wait_index.release_segment(old_position)
+                occupancy_operations.append(InterlockingOperation(InterlockingOperationType.TDS_COUNT_OUT,
+                                                                  train.name,
+                                                                  segment_id=old_position,
+                                                                  infrastructure_provider=self.sumo_infrastructure_provider))
+            else:
+                # Reserve segment before first signal
+                segment = self.segment_index.get_segment(new_position_id)
+                segment.used_by.add(train.name)
+                segment.state = OccupancyState.RESERVED
+            occupancy_operations.append(InterlockingOperation(InterlockingOperationType.TDS_COUNT_IN,
+                                                              train.name,
+                                                              segment_id=new_position,
+                                                              infrastructure_provider=self.sumo_infrastructure_provider))
+            train.current_position = new_position
+            train.position_id = new_position_id
+            if self.tracer.debug_enabled:
+                self.tracer.trace(cur_time, "segment", train=train.name, segment=new_position)
+            if train.state == TrainState.RUNNING and new_position_id == train.current_route.last_segment_id:
+                self.reach_route_end(train)
+            elif self.route_lookahead.enabled and train.state == TrainState.RUNNING and train.reserved_route is None \
+                    and train.get_current_operation().has_next_route() \
+                    and self.route_lookahead.is_due(train.current_route, new_position, self.vehicle_state.get_speed(train.name)):
+                self.trains_in_lookahead[train.name] = train
+
+        self.operations_queue.submit_batch(occupancy_operations)
 
         # Remove trains that disappear
-        for remove_train in to_remove:
-            await self.remove_train_from_simulation(remove_train)
-
-        # Update train routes
-        for train in self.trains:
-            logger.debug(f"Train {train.name} in simulation: {train.in_simulation}, has more operations: {train.has_more_operations()}")
-            if train.in_simulation:
-                logger.debug(f"Train {train.name} current position: {train.current_position}, last segment of route: {train.current_route.last_segment_of_route}")
-                logger.debug(f"Train {train.name} stops {traci.vehicle.getStops(train.name)}")
-                if train.current_position == train.current_route.last_segment_of_route:
-                    current_operation = train.get_current_operation()
-                    if current_operation.has_next_route():
-                        # Not at the end of the operation, just continue with the next route
-                        next_route = current_operation.get_next_route()
-                        route_free = self.interlocking.can_route_be_set(next_route.yaramo_route, train.name)
-                        if not route_free:
-                            logger.info(f"Route {next_route.identifier} is currently (partially) blocked."
-                                f" {train.name} has to wait")
-                        else:
-                            await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
-                                                                                            train.name,
-                                                                                            yaramo_route=next_route.yaramo_route))
-                            traci.vehicle.setRouteID(train.name, self.get_sumo_route_id(next_route))
-                            await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.FREE_ROUTE,
-                                                                                            train.name,
-                                                                                            yaramo_route=train.current_route.yaramo_route))
-                            train.current_route = next_route
-                            current_operation.current_route_counter += 1
-                            continue
-                    else:
-                        # When the train reached the end of the last operation, SUMO will remove it automatically (handled above)
-                        if train.has_more_operations():
-                            next_operation = train.get_next_operation()
-                            traci.vehicle.setRouteID(train.name, self.get_sumo_route_id(next_operation.get_current_route()))
-                            # Arrived
-                            if traci.vehicle.getSpeed(train.name) == 0 and not current_operation.arrived:
-                                current_operation.arrived = True
-                                current_operation.actual_arrival = cur_time
-                                next_operation.planned_departure = max(int(next_operation.departure),
-                                                                    current_operation.actual_arrival +
-                                                                    train.min_time_in_station)
-                                logger.debug(f"Train {train.name} start again at {next_operation.planned_departure}")
-                            # Start again
-                            if current_operation.arrived and cur_time >= next_operation.planned_departure:
-                                route_free = self.interlocking.can_route_be_set(next_operation.get_current_route().yaramo_route, train.name)
-                                if not route_free:
-                                    logger.info(f"Route {next_operation.get_current_route().identifier} is currently (partially) blocked."
-                                        f" {train.name} has to wait")
-                                else:
-                                    logger.info(f"Train {train.name} continuous on route {next_operation.get_current_route().identifier}")
-                                    next_operation.actual_departure = cur_time
-                                    await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
-                                                                                            train.name,
-                                                                                            yaramo_route=next_operation.get_current_route().yaramo_route))
-                                    await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.FREE_ROUTE,
-                                                                                        train.name,
-                                                                                        yaramo_route=train.current_route.yaramo_route))
-                                    train.current_route = next_operation.get_current_route()
-                                    train.processed_operation()
-                            else:
-                                logger.info(f"Train {train.name} waiting in station at {train.current_position}")
-
-        # Create new trains, that come up
-        for train in self.trains:
-            if not train.in_simulation:
-                first_operation = train.get_current_operation()
-                if cur_time >= first_operation.departure:  # It's time to depart
-                    route_free = self.interlocking.can_route_be_set(first_operation.get_current_route().yaramo_route, train.name)
-                    if not route_free:
-                        logger.info(f"Route {first_operation.get_current_route().identifier} currently (partially) blocked."
-                              f" {train.name} has to wait.")
-                    else:
-                        logger.info(f"Create train {train.name} on route {first_operation.get_current_route().identifier}")
-                        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
-                                                                                train.name,
-                                                                                yaramo_route=first_operation.get_current_route().yaramo_route))
-                        train.current_route = first_operation.get_current_route()
-                        first_operation.actual_departure = cur_time
-                        train.current_position = "undefined"
-                        train.in_simulation = True
-                        traci.vehicle.add(train.name, self.get_sumo_route_id(train.current_route), train.train_type)
-                else:
-                    logger.debug(f"Train {train.name} scheduled to depart at "
-                          f"{first_operation.timestamp_to_hstring(first_operation.departure)}, current time is "
-                          f"{first_operation.timestamp_to_hstring(cur_time)}")
-
-    async def remove_train_from_simulation(self, train):
-        logger.info(f"Remove train {train.name}")
-        await self.enqueue_operation(InterlockingOperation(InterlockingOperationType.FREE_ROUTE,
-                                                                train.name,
-                                                                yaramo_route=train.current_route.yaramo_route))
+        for train in to_remove:
+            self.remove_train_from_simulation(train)
+
+    def reach_route_end(self, train: Train):
+        current_operation = train.get_current_operation()
+        if train.reserved_route is not None:
+            # The next route was set ahead, the train continues without stopping in front of the signal
+            self.set_sumo_route(train, train.reserved_route)
+            train.previous_route = train.current_route
+            train.current_route = train.reserved_route
+            train.reserved_route = None
+            current_operation.current_route_counter += 1
+            return
+        train.state = TrainState.AT_ROUTE_END
+        if current_operation.has_next_route():
+            self.trains_at_route_end[train.name] = train
+        elif train.has_more_operations():
+            next_operation = train.get_next_operation()
+            self.set_sumo_route(train, next_operation.get_current_route())
+            self.trains_at_route_end[train.name] = train
+        # When the train reached the end of the last operation, SUMO will remove it automatically
+
+    async def proceed(self, train: Train, cur_time) -> bool:
+        """Executes the next action of the train depending on its state, returns False if a route is blocked"""
+        if train.state == TrainState.WAITING_TO_DEPART:
+            return await self.create_train(train, cur_time)
+        elif train.state == TrainState.AT_ROUTE_END:
+            current_operation = train.get_current_operation()
+            if current_operation.has_next_route():
+                # Not at the end of the operation, just continue with the next route
+                return await self.continue_on_next_route(train)
+            elif self.vehicle_state.get_speed(train.name) == 0:
+                # Arrived
+                next_operation = train.get_next_operation()
+                current_operation.arrived = True
+                current_operation.actual_arrival = cur_time
+                self.schedule_evaluation.record_operation(train, current_operation, train.operation_counter, cur_time)
+                next_operation.planned_departure = max(int(next_operation.departure),
+                                                       current_operation.actual_arrival + train.min_time_in_station)
+                logger.info("Train %s waiting in station at %s, start again at %s", train.name, train.current_position,
+                            next_operation.planned_departure)
+                if self.tracer.info_enabled:
+                    self.tracer.trace(cur_time, "arrived", train=train.name, segment=train.current_position,
+                                      planned_departure=next_operation.planned_departure)
+                self.trains_at_route_end.pop(train.name, None)
+                train.state = TrainState.DWELLING
+                self.schedule_departure(train, next_operation.planned_departure)
+            return True
+        elif train.state == TrainState.DWELLING:
+            return await self.continue_with_next_operation(train, cur_time)
+        return True
+
+    async def create_train(self, train: Train, cur_time) -> bool:
+        first_operation = train.get_current_operation()
+        first_route = first_operation.get_current_route()
+        if not await self.can_route_be_set(first_route, train):
+            return False
+        logger.info("Create train %s on route %s", train.name, first_route.identifier)
+        if self.tracer.info_enabled:
+            self.tracer.trace(cur_time, "created", train=train.name, route=first_route.identifier)
+        self.submit_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
+                                                    train.name,
+                                                    yaramo_route=first_route.yaramo_route))
+        train.current_route = first_route
+        first_operation.actual_departure = cur_time
+        train.current_position = "undefined"
+        train.position_id = UNDEFINED_ID
+        train.in_simulation = True
+        train.state = TrainState.RUNNING
+        self.trains_in_simulation[train.name] = train
+        with self.profiler.measure("traci_commands"):
+            self.vehicle_state.add_vehicle(train.name, self.get_sumo_route_id(train.current_route), train.train_type)
+        return True
+
+    async def reserve_next_route(self, train: Train):
+        if train.state != TrainState.RUNNING or train.reserved_route is not None:
+            return
+        next_route = train.get_current_operation().get_next_route()
+        if not await self.can_route_be_set(next_route, train):
+            # Requested again in the next segment, at the latest at the end of the route
+            return
+        logger.debug("Train %s reserved route %s ahead", train.name, next_route.identifier)
+        if self.tracer.info_enabled:
+            self.tracer.trace(self.vehicle_state.time, "reserved", train=train.name, route=next_route.identifier)
+        self.submit_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
+                                                    train.name,
+                                                    yaramo_route=next_route.yaramo_route))
+        train.reserved_route = next_route
+
+    async def continue_on_next_route(self, train: Train) -> bool:
+        current_operation = train.get_current_operation()
+        next_route = current_operation.get_next_route()
+        if not await self.can_route_be_set(next_route, train):
+            return False
+        self.submit_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
+                                                    train.name,
+                                                    yaramo_route=next_route.yaramo_route))
+        self.set_sumo_route(train, next_route)
+        if self.route_lookahead.enabled:
+            # Like a route set ahead, freed once the train left it
+            train.previous_route = train.current_route
+        else:
+            self.free_route(train)
+        train.current_route = next_route
+        current_operation.current_route_counter += 1
+        train.state = TrainState.RUNNING
+        self.trains_at_route_end.pop(train.name, None)
+        return True
+
+    async def continue_with_next_operation(self, train: Train, cur_time) -> bool:
+        next_operation = train.get_next_operation()
+        next_route = next_operation.get_current_route()
+        if not await self.can_route_be_set(next_route, train):
+            return False
+        logger.info("Train %s continuous on route %s", train.name, next_route.identifier)
+        if self.tracer.info_enabled:
+            self.tracer.trace(cur_time, "continued", train=train.name, route=next_route.identifier)
+        next_operation.actual_departure = cur_time
+        self.submit_operation(InterlockingOperation(InterlockingOperationType.SET_ROUTE,
+                                                    train.name,
+                                                    yaramo_route=next_route.yaramo_route))
+        self.free_route(train)
+        train.current_route = next_route
+        train.processed_operation()
+        train.state = TrainState.RUNNING
+        return True
+
+    def block(self, train: Train):
+        route = self.get_requested_route(train)
+        logger.info("Route %s is currently (partially) blocked. %s has to wait", route.identifier, train.name)
+        if self.tracer.info_enabled:
+            self.tracer.trace(self.vehicle_state.time, "blocked", train=train.name, route=route.identifier)
+        self.route_wait_index.add(train, route, self.get_requested_operation(train).departure)
+        self.schedule_evaluation.record_blocked(train.name, self.get_blocking_trains(train, route), self.vehicle_state.time)
+        train.blocked_in = train.state
+        train.state = TrainState.BLOCKED
+
+    def get_blocking_trains(self, train: Train, route: Route) -> List[str]:
+        """Names of the trains in the simulation whose route uses a segment of or conflicts with the given route"""
+        segments = set(route.segments)
+        matrix = self.route_wait_index.route_conflict_matrix
+        conflicting_route_keys = set(matrix.get_conflicting_route_keys(route.yaramo_route)) if matrix is not None else set()
+        blocking_trains = []
+        for other_train in self.trains_in_simulation.values():
+            if other_train is train or other_train.current_route is None:
+                continue
+            # Routes set ahead or not left yet block as well
+            other_routes = [other_route for other_route in (other_train.current_route, other_train.reserved_route, other_train.previous_route)
+                            if other_route is not None]
+            if other_train.current_position in segments or any(other_route is route or not segments.isdisjoint(other_route.segments)
+                                                               or get_route_key(other_route.yaramo_route) in conflicting_route_keys
+                                                               for other_route in other_routes):
+                blocking_trains.append(other_train.name)
+        return blocking_trains
+
+    def get_requested_route(self, train: Train) -> Route:
+        if train.state == TrainState.WAITING_TO_DEPART:
+            return train.get_current_operation().get_current_route()
+        elif train.state == TrainState.AT_ROUTE_END:
+            return train.get_current_operation().get_next_route()
+        return train.get_next_operation().get_current_route()
+
+    def get_requested_operation(self, train: Train) -> TrainOperation:
+        if train.state == TrainState.DWELLING:
+            return train.get_next_operation()
+        return train.get_current_operation()
+
+    def schedule_departure(self, train: Train, departure):
+        heapq.heappush(self.departure_queue, (departure, next(self.departure_counter), train))
+
+    def free_route(self, train: Train, route: Route | None = None):
+        if route is None:
+            route = train.current_route
+        self.submit_operation(InterlockingOperation(InterlockingOperationType.FREE_ROUTE,
+                                                    train.name,
+                                                    yaramo_route=route.yaramo_route))
+        self.route_wait_index.release_route(route)
+
+    def remove_train_from_simulation(self, train):
+        logger.info("Remove train %s", train.name)
+        if self.tracer.info_enabled:
+            self.tracer.trace(self.vehicle_state.time, "removed", train=train.name)
+        for route in (train.previous_route, train.reserved_route):
+            if route is not None:
+                self.free_route(train, route)
+        train.previous_route = train.reserved_route = None
+        self.free_route(train)
+        train.in_simulation = False
+        train.state = TrainState.FINISHED
+        self.trains_in_simulation.pop(train.name, None)
+        self.trains_at_route_end.pop(train.name, None)
+        self.route_wait_index.remove(train)
+        self.schedule_evaluation.record_unblocked(train.name, self.vehicle_state.time)
         self.finished_trains.append(train)
-        self.trains.remove(train)
+        self.trains.pop(train.name, None)
 
     def print_schedule_evaluation(self):
         logger.info("Schedule Evaluation")
@@ -0,0 +1,48 @@
+import json
+import logging
+import queue
+import threading
+from typing import Optional
+
+
+class StepTracer(object):
+    """Level-gated trace of the simulation step loop, written as JSON-Lines by a background thread.
+
+    Call sites check ``debug_enabled``/``info_enabled`` before building a record, so a disabled trace
+    costs a single attribute lookup: no string formatting and no TraCI queries. Enabled records are
+    handed to a writer thread and written to a buffered file instead of synchronously to stderr.
+    """
+
+    _STOP = object()
+
+    def __init__(self, file_name: Optional[str] = None, level=logging.INFO, buffer_size=1 << 16):
+        self.enabled = file_name is not None
+        self.info_enabled = self.enabled and level <= logging.INFO
+        self.debug_enabled = self.enabled and level <= logging.DEBUG
+        self._records: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if self.enabled:
+            self._file = open(file_name, 'w', buffering=buffer_size)  # type: ignore
+            self._writer = threading.Thread(target=self._write_records, name="step-trace-writer", daemon=True)
+            self._writer.start()
+
+    def trace(self, time, event: str, **fields):
+        fields["t"] = time
+        fields["event"] = event
+        self._records.put(fields)
+
+    def _write_records(self):
+        while True:
+            record = self._records.get()
+            if record is self._STOP:
+                break
+            self._file.write(json.dumps(record))
+            self._file.write("\n")
+        self._file.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._records.put(self._STOP)
+            self._writer.join()
+            self._writer = None
+        self.enabled = self.info_enabled = self.debug_enabled = False
@@ -0,0 +1,189 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List
+from yaramo.model import Topology, Node, Edge, Signal, SignalDirection, SignalFunction, SignalKind, DbrefGeoNode
+from railwayroutegenerator.routegenerator import RouteGenerator
+from model.trainoperation import format_hstring, base_offset
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+# Distance along the line between two points of the ladder leading to the platform tracks
+LADDER_SPACING = 50.0
+
+
+class SyntheticScenario(object):
+    """Generated line of stations with topology, metadata and schedule, for benchmarks of configurable size.
+
+    The stations lie one after another on a single track line. Every station has a number of parallel
+    platform tracks, each with an exit signal, and an entry signal on the line in front of it. The
+    platform tracks branch off a ladder of points on either side of the station, so every point has
+    exactly three connections. Trains run from the first station to the following ones, alternating the
+    platforms, in the metadata and schedule formats read by the MetadataController and ScheduleController.
+    """
+
+    def __init__(self, number_of_stations=4, platforms_per_station=2, number_of_trains=10, operations_per_train=None,
+                 headway=180, min_time_in_station=60, station_length=600.0, line_length=2000.0,
+                 train_type="regio", max_speed=120.0):
+        if number_of_stations < 2:
+            raise ValueError("A synthetic scenario needs at least two stations")
+        if platforms_per_station < 1:
+            raise ValueError("A synthetic scenario needs at least one platform per station")
+        if station_length <= 2 * LADDER_SPACING * (platforms_per_station - 1):
+            raise ValueError(f"Stations of {station_length} m are too short for {platforms_per_station} platforms")
+        self.number_of_stations = number_of_stations
+        self.platforms_per_station = platforms_per_station
+        self.number_of_trains = number_of_trains
+        self.operations_per_train = number_of_stations - 1 if operations_per_train is None \
+            else min(operations_per_train, number_of_stations - 1)
+        self.headway = headway
+        self.min_time_in_station = min_time_in_station
+        self.station_length = station_length
+        self.line_length = line_length
+        self.train_type = train_type
+        self.max_speed = max_speed  # km/h
+        self.name = f"synthetic-{number_of_stations}x{platforms_per_station}"
+
+    def get_station_name(self, station_index) -> str:
+        return f"S{station_index}"
+
+    def get_entry_signal_name(self, station_index) -> str:
+        return f"ES{station_index}"
+
+    def get_exit_signal_name(self, station_index, platform) -> str:
+        return f"AS{station_index}P{platform}"
+
+    def get_parameters(self) -> Dict:
+        return {"stations": self.number_of_stations,
+                "platforms_per_station": self.platforms_per_station,
+                "trains": self.number_of_trains,
+                "operations_per_train": self.operations_per_train,
+                "headway": self.headway,
+                "min_time_in_station": self.min_time_in_station,
+                "station_length": self.station_length,
+                "line_length": self.line_length}
+
+    def create_topology(self) -> Topology:
+        topology = Topology(name=self.name)
+
+        def add_node(x, y) -> Node:
+            node = Node(geo_node=DbrefGeoNode(x, y))
+            topology.add_node(node)
+            return node
+
+        def add_edge(node_a: Node, node_b: Node) -> Edge:
+            edge = Edge(node_a, node_b, length=node_a.geo_node.get_distance_to_other_geo_node(node_b.geo_node))
+            node_a.connected_nodes.append(node_b)
+            node_b.connected_nodes.append(node_a)
+            topology.add_edge(edge)
+            return edge
+
+        def add_signal(edge: Edge, distance_edge, function: SignalFunction, name) -> Signal:
+            signal = Signal(edge, distance_edge, SignalDirection.IN, function, SignalKind.Hauptsignal, name=name)
+            edge.signals.append(signal)
+            topology.add_signal(signal)
+            return signal
+
+        station_spacing = self.station_length + self.line_length
+        previous_exit_node = add_node(-self.line_length, 0.0)
+        for station_index in range(self.number_of_stations):
+            x = station_index * station_spacing
+            entry_node = add_node(x, 0.0)
+            exit_node = add_node(x + self.station_length, 0.0)
+            line_edge = add_edge(previous_exit_node, entry_node)
+            add_signal(line_edge, line_edge.length - 50.0, SignalFunction.Einfahr_Signal,
+                       self.get_entry_signal_name(station_index))
+            # Points the next platform branches off
+            entry_point, exit_point = entry_node, exit_node
+            for platform in range(1, self.platforms_per_station + 1):
+                y = (platform - 1) * 30.0
+                if platform == 1:
+                    platform_edge = add_edge(entry_node, exit_node)
+                elif platform < self.platforms_per_station:
+                    # The next point of the ladder, the following platforms branch off it
+                    ladder_entry_node = add_node(x + (platform - 1) * LADDER_SPACING, y)
+                    ladder_exit_node = add_node(x + self.station_length - (platform - 1) * LADDER_SPACING, y)
+                    add_edge(entry_point, ladder_entry_node)
+                    add_edge(ladder_exit_node, exit_point)
+                    platform_edge = add_edge(ladder_entry_node, ladder_exit_node)
+                    entry_point, exit_point = ladder_entry_node, ladder_exit_node
+                else:
+                    # The last platform ends the ladder, its middle node keeps the edges between two nodes unique
+                    middle_node = add_node(x + self.station_length / 2, y)
+                    add_edge(entry_point, middle_node)
+                    platform_edge = add_edge(middle_node, exit_point)
+                add_signal(platform_edge, platform_edge.length - 20.0, SignalFunction.Ausfahr_Signal,
+                           self.get_exit_signal_name(station_index, platform))
+            previous_exit_node = exit_node
+        add_edge(previous_exit_node, add_node((self.number_of_stations - 1) * station_spacing + station_spacing, 0.0))
+
+        for node in topology.nodes.values():
+            node.calc_anschluss_of_all_nodes()
+        RouteGenerator(topology).generate_routes()
+        logger.info(f"Generated topology {self.name} with {len(topology.nodes)} nodes, {len(topology.edges)} edges, "
+                    f"{len(topology.signals)} signals and {len(topology.routes)} routes")
+        return topology
+
+    def create_metadata(self) -> Dict:
+        stations_json = {}
+        for station_index in range(self.number_of_stations):
+            platforms_json = {}
+            for platform in range(1, self.platforms_per_station + 1):
+                directions = []
+                if station_index < self.number_of_stations - 1:
+                    for to_platform in range(1, self.platforms_per_station + 1):
+                        entry_signal = self.get_entry_signal_name(station_index + 1)
+                        directions.append({"to": self.get_station_name(station_index + 1),
+                                           "to_platform": to_platform,
+                                           "routes": [{"start_signal": self.get_exit_signal_name(station_index, platform),
+                                                       "end_signal": entry_signal},
+                                                      {"start_signal": entry_signal,
+                                                       "end_signal": self.get_exit_signal_name(station_index + 1, to_platform)}]})
+                platforms_json[str(platform)] = directions
+            stations_json[self.get_station_name(station_index)] = {"platforms": platforms_json}
+        return {"stations": stations_json}
+
+    def get_run_time(self) -> int:
+        # Planned time from one platform to the next, with some reserve
+        return int((self.station_length + self.line_length) / (self.max_speed / 3.6) * 1.2) + 30
+
+    def get_planned_duration(self) -> int:
+        """Planned simulation time until the last train arrives"""
+        return (self.number_of_trains - 1) * self.headway + \
+            self.operations_per_train * (self.get_run_time() + self.min_time_in_station)
+
+    def iter_schedule(self):
+        """Yields the trains sorted by their first departure, so the schedule can also be streamed"""
+        run_time = self.get_run_time()
+        for train_index in range(self.number_of_trains):
+            platform = train_index % self.platforms_per_station + 1
+            departure = base_offset + train_index * self.headway
+            operations = []
+            for station_index in range(self.operations_per_train):
+                arrival = departure + run_time
+                operations.append({"from": self.get_station_name(station_index),
+                                   "from_platform": platform,
+                                   "to": self.get_station_name(station_index + 1),
+                                   "to_platform": platform,
+                                   "departure": format_hstring(departure),
+                                   "arrival": format_hstring(arrival)})
+                departure = arrival + self.min_time_in_station
+            yield {"name": f"T{train_index}",
+                   "type": self.train_type,
+                   "min_time_in_station": self.min_time_in_station,
+                   "operations": operations}
+
+    def write_files(self, output_dir) -> List[str]:
+        """Writes the metadata and the schedule (JSON-Lines) and returns their file names"""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        metadata_file_name = output_dir / f"{self.name}.metadata.json"
+        with open(metadata_file_name, 'w') as f:
+            json.dump(self.create_metadata(), f, indent=2)
+        schedule_file_name = output_dir / f"{self.name}-{self.number_of_trains}.schedule.jsonl"
+        with open(schedule_file_name, 'w') as f:
+            for train_json in self.iter_schedule():
+                f.write(json.dumps(train_json))
+                f.write("\n")
+        return [str(metadata_file_name), str(schedule_file_name)]
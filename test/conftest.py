@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture
+def scenario_dir(tmp_path, monkeypatch):
+    # Caches and the SUMO scenario are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+TEST_DIR = Path(__file__).parent
+PLAN_PRO_FILE = str(TEST_DIR / "complex-example.ppxml")
+PLAN_PRO_VERSION = "1.9"
+METADATA_FILE = str(TEST_DIR / "complex-example.metadata.json")
+SCHEDULE_FILE = str(TEST_DIR / "complex-example.schedule.json")
+
+
+def create_fake_controller(topology=None):
+    """Controller for the complex example on the in-memory fake TraCI, e.g. on the topology of another one"""
+    from controller import compile_scenario, create_controller, create_sumo_scenario
+    from tracibackend import start_backend
+    if topology is None:
+        topology = compile_scenario(PLAN_PRO_FILE, PLAN_PRO_VERSION).topology
+        create_sumo_scenario(topology)
+    return create_controller(topology, METADATA_FILE, start_backend("fake", []), real_time_factor=None)
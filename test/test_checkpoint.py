@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+
+for module_name in ("traci", "yaramo", "interlocking", "planpro_importer", "sumoexporter", "railwayroutegenerator"):
+    pytest.importorskip(module_name)
+
+from checkpoint import create_checkpoint, get_shared_objects, restore_checkpoint
+from observationtrace import ObservationRecorder, diff_operations
+from interlocking.model.helper import InterlockingOperation, InterlockingOperationType
+from test.scenario import SCHEDULE_FILE, create_fake_controller
+
+END_TIME = 2 * 3600
+
+
+def record_operations(controller) -> ObservationRecorder:
+    observation_recorder = ObservationRecorder(keep_operations=True)
+    controller.record_observations(observation_recorder)
+    return observation_recorder
+
+
+def continue_recording(observation_recorder: ObservationRecorder, operations, time):
+    # Operations submitted after a restore continue the stream at the time of the checkpoint
+    observation_recorder.operations = list(operations)
+    observation_recorder.time = time
+
+
+async def run_with_interlocking(controllers, run):
+    """Runs the coroutine function with the interlockings of the controllers, like Controller.run_schedules"""
+    async with asyncio.TaskGroup() as tg:
+        for controller in controllers:
+            tg.create_task(controller.interlocking.run_with_operations_queue(controller.operations_queue))
+        try:
+            return await run()
+        finally:
+            for controller in controllers:
+                controller.operations_queue.put_nowait(InterlockingOperation(InterlockingOperationType.EXIT))
+
+
+def run_baseline():
+    """Operations of an uninterrupted run and a time at which the train is on its way"""
+    controller = create_fake_controller()
+    observation_recorder = record_operations(controller)
+    asyncio.run(controller.run_schedules([SCHEDULE_FILE], until=END_TIME))
+    operation = controller.simulation_controller.finished_trains[0].operations[0]
+    return controller.topology, observation_recorder.operations, (operation.actual_departure + operation.actual_arrival) / 2
+
+
+async def run_until_checkpoint(controller, checkpoint_time, checkpoint_dir):
+    simulation_controller = controller.simulation_controller
+    await controller.reset()
+    simulation_controller.load_schedule(SCHEDULE_FILE)
+    await simulation_controller.run_simulation(until=checkpoint_time)
+    assert list(simulation_controller.trains) == ["RB101"]
+    assert "RB101" in simulation_controller.trains_in_simulation
+    return await create_checkpoint(controller, "middle", checkpoint_dir)
+
+
+def test_restored_checkpoint_continues_like_uninterrupted_run(scenario_dir):
+    topology, baseline_operations, checkpoint_time = run_baseline()
+    controller = create_fake_controller(topology)
+    observation_recorder = record_operations(controller)
+    simulation_controller = controller.simulation_controller
+
+    async def run():
+        checkpoint = await run_until_checkpoint(controller, checkpoint_time, str(scenario_dir))
+        operations_before_checkpoint = list(observation_recorder.operations)
+        await simulation_controller.run_simulation(until=END_TIME)
+        operations = list(observation_recorder.operations)
+
+        await restore_checkpoint(controller, checkpoint)
+        assert list(simulation_controller.trains) == ["RB101"]
+        assert simulation_controller.finished_trains == []
+        continue_recording(observation_recorder, operations_before_checkpoint, checkpoint.time)
+        await simulation_controller.run_simulation(until=END_TIME)
+        return operations, observation_recorder.operations
+
+    operations, restored_operations = asyncio.run(run_with_interlocking([controller], run))
+    assert diff_operations(baseline_operations, operations)["equal"]
+    diff = diff_operations(baseline_operations, restored_operations)
+    assert diff["equal"], diff
+    assert [train.name for train in simulation_controller.finished_trains] == ["RB101"]
+
+
+def test_reset_restores_initial_checkpoint(scenario_dir):
+    topology, baseline_operations, _ = run_baseline()
+    controller = create_fake_controller(topology)
+    observation_recorder = record_operations(controller)
+    simulation_controller = controller.simulation_controller
+
+    async def run():
+        await controller.reset()
+        controller.initial_checkpoint = await create_checkpoint(controller, "initial", str(scenario_dir))
+        runs = []
+        for _ in range(2):
+            continue_recording(observation_recorder, [], 0)
+            simulation_controller.load_schedule(SCHEDULE_FILE)
+            await simulation_controller.run_simulation(until=END_TIME)
+            runs.append(observation_recorder.operations)
+            await controller.reset()
+            assert simulation_controller.trains == {} and simulation_controller.finished_trains == []
+        return runs
+
+    runs = asyncio.run(run_with_interlocking([controller], run))
+    # The baseline starts with the reset of the interlocking, restoring the initial checkpoint replaces it
+    assert baseline_operations[0]["op"] == "RESET"
+    for operations in runs:
+        diff = diff_operations(baseline_operations[1:], operations)
+        assert diff["equal"], diff
+
+
+def test_forks_do_not_share_state(scenario_dir):
+    topology, baseline_operations, checkpoint_time = run_baseline()
+    controller = create_fake_controller(topology)
+    observation_recorder = record_operations(controller)
+    checkpoint = asyncio.run(run_with_interlocking(
+        [controller], lambda: run_until_checkpoint(controller, checkpoint_time, str(scenario_dir))))
+    operations_before_checkpoint = list(observation_recorder.operations)
+
+    forks = [create_fake_controller(topology) for _ in range(2)]
+    fork_recorders = [record_operations(fork) for fork in forks]
+    fork_a, fork_b = [fork.simulation_controller for fork in forks]
+
+    async def run():
+        for fork, fork_recorder in zip(forks, fork_recorders):
+            await restore_checkpoint(fork, checkpoint)
+            continue_recording(fork_recorder, operations_before_checkpoint, checkpoint.time)
+
+        train_a, train_b = fork_a.trains["RB101"], fork_b.trains["RB101"]
+        assert train_a is not train_b
+        assert train_a.operations[0] is not train_b.operations[0]
+        assert fork_a.trains_in_simulation is not fork_b.trains_in_simulation
+        assert fork_a.route_wait_index is not fork_b.route_wait_index
+        shared_ids = {id(shared_object) for fork in forks for shared_object in get_shared_objects(fork).values()}
+        interlocking_b = forks[1].interlocking.__dict__
+        for name, value in forks[0].interlocking.__dict__.items():
+            if isinstance(value, (dict, list, set)) and id(value) not in shared_ids:
+                assert value is not interlocking_b[name], name
+
+        # Finishing one fork leaves the other one at the checkpoint
+        await fork_a.run_simulation(until=END_TIME)
+        assert [train.name for train in fork_a.finished_trains] == ["RB101"]
+        assert list(fork_b.trains) == ["RB101"] and fork_b.finished_trains == []
+        assert fork_b.vehicle_state.time == checkpoint.time
+        await fork_b.run_simulation(until=END_TIME)
+
+    asyncio.run(run_with_interlocking(forks, run))
+    for fork_recorder in fork_recorders:
+        diff = diff_operations(baseline_operations, fork_recorder.operations)
+        assert diff["equal"], diff
@@ -0,0 +1,19 @@
+import asyncio
+import pytest
+
+for module_name in ("traci", "yaramo", "interlocking", "planpro_importer", "sumoexporter", "railwayroutegenerator"):
+    pytest.importorskip(module_name)
+
+from controllersupervisor import ControllerInstance, ControllerSupervisor
+from test.scenario import METADATA_FILE, PLAN_PRO_FILE, PLAN_PRO_VERSION, SCHEDULE_FILE
+
+
+def test_failed_start_is_reported_and_others_run(scenario_dir):
+    instances = [ControllerInstance("missing", str(scenario_dir / "missing.ppxml"), PLAN_PRO_VERSION, METADATA_FILE, [SCHEDULE_FILE]),
+                 ControllerInstance("complex", PLAN_PRO_FILE, PLAN_PRO_VERSION, METADATA_FILE, [SCHEDULE_FILE])]
+    summary = asyncio.run(ControllerSupervisor(instances, "fake", max_simulation_time=2 * 3600).run())
+
+    missing, complex_example = summary["instances"]
+    assert missing["name"] == "missing" and not missing["completed"] and missing["error"] is not None
+    assert complex_example["name"] == "complex" and complex_example["completed"]
+    assert (summary["completed"], summary["failed"]) == (1, 1)
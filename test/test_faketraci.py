@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+import pytest
+
+for module_name in ("traci", "yaramo", "interlocking", "planpro_importer", "sumoexporter", "railwayroutegenerator"):
+    pytest.importorskip(module_name)
+
+from test.scenario import METADATA_FILE, SCHEDULE_FILE, create_fake_controller
+
+
+def test_schedule_finishes_on_fake_traci(scenario_dir):
+    controller = create_fake_controller()
+    asyncio.run(controller.run_schedules([SCHEDULE_FILE], until=2 * 3600))
+
+    simulation_controller = controller.simulation_controller
+    assert len(simulation_controller.trains) == 0
+    assert [train.name for train in simulation_controller.finished_trains] == ["RB101"]
+    operation = simulation_controller.finished_trains[0].operations[0]
+    assert operation.actual_departure >= operation.departure
+    assert operation.actual_arrival > operation.actual_departure
+
+
+@pytest.mark.parametrize("real_time_factor", [0, -1.0])
+def test_real_time_factor_must_be_positive(scenario_dir, real_time_factor):
+    from controller import create_controller, positive_float
+    from tracibackend import start_backend
+    topology = create_fake_controller().topology
+    with pytest.raises(ValueError):
+        create_controller(topology, METADATA_FILE, start_backend("fake", []), real_time_factor=real_time_factor)
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_float(str(real_time_factor))
+    assert positive_float("0.5") == 0.5
@@ -0,0 +1,27 @@
+import asyncio
+import pytest
+
+for module_name in ("traci", "yaramo", "interlocking", "planpro_importer", "sumoexporter", "railwayroutegenerator"):
+    pytest.importorskip(module_name)
+
+from observationtrace import ObservationRecorder, ReplayTraci, diff_operations, load_operations
+from replaytrace import create_replay_controller, replay_trace
+from test.scenario import METADATA_FILE, PLAN_PRO_FILE, PLAN_PRO_VERSION, SCHEDULE_FILE, create_fake_controller
+
+
+def test_replay_reproduces_recorded_operations(scenario_dir):
+    controller = create_fake_controller()
+    controller.set_route_lookahead(2)
+    controller.record_observations(ObservationRecorder("trace.jsonl"))
+    asyncio.run(controller.run_schedules([SCHEDULE_FILE], until=2 * 3600))
+
+    replay_traci = ReplayTraci("trace.jsonl")
+    replay_controller = create_replay_controller(PLAN_PRO_FILE, PLAN_PRO_VERSION, METADATA_FILE, replay_traci)
+    route_lookahead = replay_controller.simulation_controller.route_lookahead
+    assert (route_lookahead.lookahead, route_lookahead.unit) == (2, "segments")
+    assert replay_controller.simulation_controller.get_configuration() == replay_traci.configuration
+
+    operations = asyncio.run(replay_trace(replay_controller, replay_traci, [SCHEDULE_FILE]))
+    diff = diff_operations(load_operations("trace.jsonl"), operations)
+    assert diff["baseline_operations"] > 0
+    assert diff["equal"], diff
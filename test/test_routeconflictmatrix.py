@@ -0,0 +1,23 @@
+import pytest
+
+for module_name in ("yaramo", "interlocking"):
+    pytest.importorskip(module_name)
+
+from routeconflictmatrix import RouteConflictMatrix
+
+
+def test_save_and_load(tmp_path):
+    matrix = RouteConflictMatrix(["A-B", "B-C", "C-D"], [0b110, 0b001, 0b001])
+    cache_file = tmp_path / "cache" / "matrix.json"
+    matrix.save(cache_file)
+    loaded = RouteConflictMatrix.load(cache_file)
+    assert loaded.route_keys == matrix.route_keys and loaded.conflicts == matrix.conflicts
+    assert [path.name for path in cache_file.parent.iterdir()] == ["matrix.json"]
+
+
+@pytest.mark.parametrize("content", ["", '{"version": 1, "routes": ["A-B"], "confl', "[]", '{"version": 1}',
+                                     '{"version": 1, "routes": ["A-B"], "conflicts": ["xyz"]}'])
+def test_corrupt_cache_file_is_not_loaded(tmp_path, content):
+    cache_file = tmp_path / "matrix.json"
+    cache_file.write_text(content)
+    assert RouteConflictMatrix.load(cache_file) is None
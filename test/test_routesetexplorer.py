@@ -0,0 +1,89 @@
+import random
+from itertools import combinations
+import pytest
+
+for module_name in ("yaramo", "interlocking"):
+    pytest.importorskip(module_name)
+
+from routeconflictmatrix import RouteConflictMatrix
+from routesetexplorer import RouteSetExplorer
+
+
+def create_random_matrix(rng: random.Random, number_of_routes: int, conflict_probability: float) -> RouteConflictMatrix:
+    route_keys = [f"S{i}-E{i}" for i in range(number_of_routes)]
+    conflicts = [0] * number_of_routes
+    for i, j in combinations(range(number_of_routes), 2):
+        if rng.random() < conflict_probability:
+            conflicts[i] |= 1 << j
+            conflicts[j] |= 1 << i
+    return RouteConflictMatrix(route_keys, conflicts)
+
+
+def is_compatible(matrix: RouteConflictMatrix, route_set) -> bool:
+    return all((matrix.conflicts[matrix.index_of_route[a]] >> matrix.index_of_route[b]) & 1 == 0
+               for a, b in combinations(route_set, 2))
+
+
+def get_compatible_sets(matrix: RouteConflictMatrix, route_keys):
+    return [frozenset(route_set) for size in range(1, len(route_keys) + 1)
+            for route_set in combinations(route_keys, size) if is_compatible(matrix, route_set)]
+
+
+def get_maximal_sets(matrix: RouteConflictMatrix, route_keys):
+    compatible_sets = get_compatible_sets(matrix, route_keys)
+    return {route_set for route_set in compatible_sets
+            if not any(is_compatible(matrix, route_set | {route_key}) for route_key in route_keys if route_key not in route_set)}
+
+
+def create_random_matrices():
+    rng = random.Random(42)
+    for _ in range(30):
+        yield create_random_matrix(rng, rng.randint(1, 9), rng.choice([0.0, 0.2, 0.5, 0.8, 1.0]))
+
+
+def test_maximal_sets_match_brute_force():
+    for matrix in create_random_matrices():
+        route_sets = list(RouteSetExplorer(matrix).get_maximal_compatible_sets())
+        assert len(route_sets) == len(set(map(frozenset, route_sets)))
+        assert set(map(frozenset, route_sets)) == get_maximal_sets(matrix, matrix.route_keys)
+
+
+def test_maximal_sets_of_a_subset_of_routes():
+    for matrix in create_random_matrices():
+        route_keys = matrix.route_keys[::2]
+        route_sets = RouteSetExplorer(matrix, route_keys).get_maximal_compatible_sets()
+        assert set(map(frozenset, route_sets)) == get_maximal_sets(matrix, route_keys)
+
+
+def test_bounded_sets_are_all_sets_of_max_size_and_smaller_maximal_sets():
+    for matrix in create_random_matrices():
+        maximal_sets = get_maximal_sets(matrix, matrix.route_keys)
+        compatible_sets = get_compatible_sets(matrix, matrix.route_keys)
+        for max_size in range(1, 5):
+            route_sets = list(RouteSetExplorer(matrix).get_maximal_compatible_sets(max_size))
+            assert len(route_sets) == len(set(map(frozenset, route_sets)))
+            expected = {route_set for route_set in compatible_sets if len(route_set) == max_size} | \
+                       {route_set for route_set in maximal_sets if len(route_set) < max_size}
+            assert set(map(frozenset, route_sets)) == expected
+
+
+def test_no_routes():
+    matrix = RouteConflictMatrix([], [])
+    assert list(RouteSetExplorer(matrix).get_maximal_compatible_sets()) == []
+
+
+def test_samples_are_distinct_maximal_sets_and_reproducible():
+    for matrix in create_random_matrices():
+        explorer = RouteSetExplorer(matrix)
+        maximal_sets = get_maximal_sets(matrix, matrix.route_keys)
+        samples = explorer.sample_compatible_sets(5, seed=7)
+        assert samples == explorer.sample_compatible_sets(5, seed=7)
+        assert 0 < len(samples) <= min(5, len(maximal_sets))
+        assert len(samples) == len(set(map(frozenset, samples)))
+        assert all(frozenset(sample) in maximal_sets for sample in samples)
+
+
+def test_samples_respect_max_size():
+    for matrix in create_random_matrices():
+        samples = RouteSetExplorer(matrix).sample_compatible_sets(5, max_size=2, seed=7)
+        assert all(1 <= len(sample) <= 2 and is_compatible(matrix, sample) for sample in samples)
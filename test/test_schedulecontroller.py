@@ -0,0 +1,62 @@
+import io
+import json
+import pytest
+
+for module_name in ("traci", "yaramo"):
+    pytest.importorskip(module_name)
+
+from schedulecontroller import iter_json_array, load_route_ids, load_vehicle_types
+
+VALUES = [{"name": "RB101", "operations": [{"from": "A-Dorf", "to": "B-Stadt", "departure": "10:00:00"}]},
+          "contains ] and , and [", "escaped \" ], ", 12345, -1.5e3, 0, True, False, None, [], {}, [[1, [2]], {"a": []}]]
+
+
+def read_array(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_values_split_across_chunks(chunk_size):
+    assert read_array(json.dumps(VALUES), chunk_size) == VALUES
+    assert read_array(json.dumps(VALUES, indent=2), chunk_size) == VALUES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_numbers_at_chunk_boundaries(chunk_size):
+    # A number ending exactly at the end of a chunk might continue in the next one
+    numbers = [1, 12, 123, 1234, 12345, 1.25, 10e5]
+    assert read_array(json.dumps(numbers), chunk_size) == numbers
+    assert read_array("  [ 1 ,\n 23 ]  ", chunk_size) == [1, 23]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1 << 16])
+def test_empty_array(chunk_size):
+    assert read_array("[]", chunk_size) == []
+    assert read_array(" \n[ \n] ", chunk_size) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+@pytest.mark.parametrize("text", ["", "   ", "{}", "[", "[1", "[1,", "[1,]", "[1 2]", '["a]', "[tru]", "[1,,2]", "[,1]"])
+def test_malformed_input(text, chunk_size):
+    with pytest.raises(ValueError):
+        read_array(text, chunk_size)
+
+
+def test_values_are_yielded_before_the_end_is_read():
+    values = iter_json_array(io.StringIO('[{"name": "first"}, {"name": "second"'), chunk_size=4)
+    assert next(values) == {"name": "first"}
+    with pytest.raises(ValueError):
+        next(values)
+
+
+def test_load_route_ids_and_vehicle_types(tmp_path):
+    (tmp_path / "scenario.sumocfg").write_text(
+        '<configuration><input><net-file value="scenario.net.xml"/>'
+        '<route-files value="scenario.rou.xml"/><additional-files value=" , types.add.xml"/></input></configuration>')
+    (tmp_path / "scenario.rou.xml").write_text(
+        '<routes><route id="route_A-B" edges="a b"/><route id="route_B-C" edges="b c"/>'
+        '<vehicle id="v" depart="0"><route edges="a"/></vehicle></routes>')
+    (tmp_path / "types.add.xml").write_text('<additional><vType id="regio" maxSpeed="25"/><vType id="default"/></additional>')
+    sumo_config_file_name = str(tmp_path / "scenario.sumocfg")
+    assert load_route_ids(sumo_config_file_name) == {"route_A-B", "route_B-C"}
+    assert load_vehicle_types(sumo_config_file_name) == {"regio": 90.0}
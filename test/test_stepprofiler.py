@@ -0,0 +1,29 @@
+from stepprofiler import StepProfiler
+
+
+def test_measure_adds_to_step_when_enabled():
+    profiler = StepProfiler(enabled=True)
+    for _ in range(2):
+        with profiler.measure("traci_commands"):
+            pass
+    assert list(profiler.step_durations) == ["traci_commands"]
+    profiler.record_step(0.0, 1.0)
+    assert profiler.histograms["traci_commands"].count == 1
+    assert profiler.step_durations == {}
+
+
+def test_measure_does_nothing_when_disabled():
+    profiler = StepProfiler()
+    with profiler.measure("traci_commands"):
+        pass
+    assert profiler.step_durations == {} and profiler.histograms == {}
+
+
+def test_measure_adds_to_step_on_exceptions():
+    profiler = StepProfiler(enabled=True)
+    try:
+        with profiler.measure("traci_queries"):
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert list(profiler.step_durations) == ["traci_queries"]
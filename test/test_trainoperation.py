@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("yaramo")
+
+from model.trainoperation import SECONDS_PER_DAY, TrainOperation, base_offset, format_hstring, parse_hstring
+
+
+@pytest.mark.parametrize("hstring, seconds", [
+    ("00:00:00", 0),
+    ("10:00:00", 10 * 3600),
+    ("23:59:59", SECONDS_PER_DAY - 1),
+    ("+1 01:30:00", SECONDS_PER_DAY + 5400),
+    ("+2 00:00:00", 2 * SECONDS_PER_DAY),
+    ("-1 23:00:00", -3600),
+    ("-2 12:00:00", -SECONDS_PER_DAY - 12 * 3600),
+])
+def test_round_trip(hstring, seconds):
+    assert parse_hstring(hstring) == seconds
+    assert format_hstring(seconds) == hstring
+
+
+def test_hours_past_midnight():
+    assert parse_hstring("25:30:00") == parse_hstring("+1 01:30:00")
+    assert format_hstring(parse_hstring("25:30:00")) == "+1 01:30:00"
+    assert parse_hstring("+1 25:30:00") == 2 * SECONDS_PER_DAY + 5400
+
+
+@pytest.mark.parametrize("seconds", range(-3 * SECONDS_PER_DAY, 3 * SECONDS_PER_DAY, 3631))
+def test_format_parse_round_trip(seconds):
+    assert parse_hstring(format_hstring(seconds)) == seconds
+
+
+def test_negative_offsets_to_base_time():
+    operation = TrainOperation()
+    for timestamp in (-base_offset - 1, -base_offset, -60, 0, SECONDS_PER_DAY):
+        assert operation.recalc_timestamp(operation.timestamp_to_hstring(timestamp)) == timestamp
+    assert operation.timestamp_to_hstring(-base_offset - 3600) == "-1 23:00:00"
+
+
+@pytest.mark.parametrize("hstring", ["10:60:00", "10:00:60", "-01:00:00", "10:00", "+x 10:00:00"])
+def test_invalid_times(hstring):
+    with pytest.raises(ValueError):
+        parse_hstring(hstring)
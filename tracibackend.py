@@ -0,0 +1,63 @@
+import logging
+import os
+from typing import Dict, List, Set
+from faketraci import FakeTraci
+
+# Module-level logger
+logger = logging.getLogger(__name__)
+
+# socket TraCI, SUMO in-process via libsumo, or the in-memory fake without SUMO
+BACKENDS = ["traci", "libsumo", "fake"]
+
+
+def get_default_backend_name() -> str:
+    # Same switch sumolib offers to make "import traci" load libsumo
+    return "libsumo" if os.environ.get("LIBSUMO_AS_TRACI") else "traci"
+
+
+def start_backend(backend_name, sumo_command: List[str], port=None, label="default", step_length=0.1):
+    """Starts SUMO with the given backend and returns the handle to pass to the controllers.
+
+    The handle offers the TraCI API (``simulationStep``, ``vehicle``, ``route``, ...) whichever backend
+    is used. libsumo runs SUMO in this process, so every call is a function call instead of a socket round
+    trip, but it can neither show the GUI nor run more than one simulation per process.
+    """
+    if backend_name == "traci":
+        import traci
+        traci.start(sumo_command, port=port, label=label)
+        # A connection of its own, so that several simulations can be driven from one process
+        return traci.getConnection(label)
+    elif backend_name == "libsumo":
+        if os.path.basename(sumo_command[0]).startswith("sumo-gui"):
+            raise ValueError("libsumo can not run sumo-gui, use the traci backend")
+        import libsumo
+        libsumo.start(sumo_command)
+        return libsumo
+    elif backend_name == "fake":
+        # The routes of the fake are known once the interlocking is prepared, see prepare_backend
+        return FakeTraci({}, step_length=step_length)
+    raise ValueError(f"Unknown TraCI backend {backend_name}, use one of {', '.join(BACKENDS)}")
+
+
+def get_sumo_route_ids(traci_instance, topology, route_ids: Set[str] | None = None) -> Set[str]:
+    """Ids of the routes the backend can drive vehicles on, the given ones if known, e.g. from a trace"""
+    if isinstance(traci_instance, FakeTraci):
+        return traci_instance.get_route_ids(topology)
+    if route_ids is not None:
+        return route_ids
+    return set(traci_instance.route.getIDList())
+
+
+def prepare_backend(traci_instance, interlocking, topology, vehicle_type_max_speeds: Dict[str, float]):
+    """Called once the interlocking is prepared, the fake builds its routes from it, SUMO needs nothing"""
+    if isinstance(traci_instance, FakeTraci):
+        traci_instance.prepare(interlocking, topology, vehicle_type_max_speeds)
+
+
+def connect_backend(backend_name, host, port, label="default"):
+    """Connects to an already running SUMO, e.g. sumo-gui, which is only possible via socket TraCI"""
+    if backend_name != "traci":
+        raise ValueError(f"Connecting to a running SUMO needs the traci backend, not {backend_name}")
+    import traci
+    traci.init(host=host, port=port, label=label)
+    return traci.getConnection(label)
@@ -0,0 +1,63 @@
+from typing import Dict, Iterable, Set
+import traci
+from traci import constants as tc
+
+
+# Variables subscribed for each train, delivered together with the response of traci.simulationStep
+VEHICLE_VARIABLES = [tc.VAR_ROAD_ID, tc.VAR_SPEED, tc.VAR_STOPSTATE]
+SIMULATION_VARIABLES = [tc.VAR_TIME, tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS]
+
+
+class VehicleStateObserver(object):
+    """Per-step view on the trains in SUMO, filled from TraCI subscriptions.
+
+    Every vehicle is subscribed once when it is added, so reading the state of all trains after a
+    simulation step does not need any further round trip to SUMO.
+    """
+
+    def __init__(self, traci_instance=traci):
+        self.traci_instance = traci_instance
+        self.time: float = 0
+        self.road_ids: Dict[str, str] = {}
+        self.speeds: Dict[str, float] = {}
+        self.stop_states: Dict[str, int] = {}
+        self.departed: Set[str] = set()
+        self.arrived: Set[str] = set()
+
+    def subscribe_simulation(self):
+        self.traci_instance.simulation.subscribe(SIMULATION_VARIABLES)
+
+    def add_vehicle(self, vehicle_id: str, route_id: str, type_id: str):
+        self.traci_instance.vehicle.add(vehicle_id, route_id, type_id)
+        self.traci_instance.vehicle.subscribe(vehicle_id, VEHICLE_VARIABLES)
+
+    def resubscribe(self, vehicle_ids: Iterable[str]):
+        for vehicle_id in vehicle_ids:
+            self.traci_instance.vehicle.subscribe(vehicle_id, VEHICLE_VARIABLES)
+
+    def update(self):
+        simulation_results = self.traci_instance.simulation.getSubscriptionResults()
+        self.time = simulation_results[tc.VAR_TIME]
+        self.departed = set(simulation_results[tc.VAR_DEPARTED_VEHICLES_IDS])
+        self.arrived = set(simulation_results[tc.VAR_ARRIVED_VEHICLES_IDS])
+
+        self.road_ids.clear()
+        self.speeds.clear()
+        self.stop_states.clear()
+        for vehicle_id, results in self.traci_instance.vehicle.getAllSubscriptionResults().items():
+            self.road_ids[vehicle_id] = results[tc.VAR_ROAD_ID]
+            self.speeds[vehicle_id] = results[tc.VAR_SPEED]
+            self.stop_states[vehicle_id] = results[tc.VAR_STOPSTATE]
+
+    def get_road_id(self, vehicle_id: str) -> str:
+        # Vehicles that are added but not inserted yet have no road
+        return self.road_ids.get(vehicle_id, "")
+
+    def get_speed(self, vehicle_id: str) -> float:
+        return self.speeds.get(vehicle_id, 0)
+
+    def get_stop_state(self, vehicle_id: str) -> int:
+        return self.stop_states.get(vehicle_id, 0)
+
+    def has_arrived(self, vehicle_id: str) -> bool:
+        return vehicle_id in self.arrived